@@ -14,11 +14,20 @@ Additional functions are made available by importing the AdvancedGameState
 class from gamelib/advanced.py as a replcement for the regular GameState class 
 in game.py.
 
-You can analyze action frames by modifying algocore.py.
+You can analyze action frames by overriding on_action_frame, or set 
+self.summarize_action_phase to get self.action_phase_summary each turn.
 
 The GameState.map object can be manually manipulated to create hypothetical 
 board states. Though, we recommended making a copy of the map to preserve 
-the actual current map state.
+the actual current map state. GameState.clone() makes a cheap copy, and 
+checkpoint() and undo() revert hypothetical changes.
+
+To stay within the turn time limit, plan in steps and hand them to 
+AlgoCore.submit_anytime, which submits the best plan ready by the deadline.
+self.turn_budget tells how much time the current turn has left.
+Work that does not need the next turn's state, like paths on the board 
+you just built, can go in precompute, which runs during the action phase 
+and leaves its result in self.precomputed for the next on_turn.
 """
 
 class AlgoStrategy(gamelib.AlgoCore):
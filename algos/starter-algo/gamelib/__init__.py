@@ -8,6 +8,15 @@ from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
 from .advanced_game_state import AdvancedGameState
+from .simulator import ActionPhaseSimulator, SimulationResult
+from .rollout import RolloutPool
+from .turn_budget import TurnBudget
+from .action_frame import ActionFrame, ActionPhaseSummary
+from .background import BackgroundTask
+from .replay import ReplayReader
+from .replay_store import ReplayStore, ReplayTable
+from .transport import StdioTransport, StreamTransport, SocketTransport, QueueTransport
+from .engine import LocalEngine, MatchResult, play_matches
 
-__all__ = ["advanced_game_state", "algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["action_frame", "advanced_game_state", "algocore", "background", "engine", "game_state", "game_map", "navigation", "replay", "replay_store", "rollout", "simulator", "transport", "turn_budget", "unit", "util"]
  
\ No newline at end of file
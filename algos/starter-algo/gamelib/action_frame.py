@@ -0,0 +1,150 @@
+import json
+
+from .util import decode_json
+
+# Decodes single values out of a longer string, see ActionFrame.get_events
+_value_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class ActionFrame:
+    """A frame of the action phase, decoded lazily
+
+    The game sends dozens of frames each turn, and most of each one describes the units on the board.
+    An ActionFrame only decodes the events and values that are asked for.
+    ReplayReader also uses it for the other frames of a replay.
+
+    Attributes:
+        * state_type (int): 0 for the state at the start of a turn, 1 for action frames and 2 for the end of the game
+        * turn_number (int): The turn whose action phase this frame belongs to
+        * frame_number (int): The frame's number within the action phase, starting at 0
+        * line (str): The frame's json string, as the game sent it
+
+    """
+    def __init__(self, config, line, turn_info):
+        """Wraps a frame as received from the game
+
+        Args:
+            * config (JSON): Contains information about the game
+            * line: The frame's json string
+            * turn_info: The frame's decoded turnInfo
+
+        """
+        self.config = config
+        self.state_type = int(turn_info[0])
+        self.turn_number = int(turn_info[1])
+        self.frame_number = int(turn_info[2])
+        self.line = line
+        self._events = {}
+
+    def get_events(self, name):
+        """Gets one type of event that happened this frame
+
+        Args:
+            * name: The type of event, one of "spawn", "move", "damage", "attack", "death", "breach", "shield", "selfDestruct" or "melee"
+
+        Returns:
+            The events as the game sends them, for example [[x, y], damage, unit_type_index, unit_id, player] for a breach
+
+        """
+        events = self._events.get(name)
+        if events is None:
+            events = self._events[name] = self.__decode_events(name)
+        return events
+
+    def get_value(self, name):
+        """Gets one top level value of the frame, like "p1Stats" or "endStats"
+
+        Keys nested in other values, like endStats' "winner", can not be looked up this way.
+
+        Args:
+            * name: The value's key
+
+        Returns:
+            The decoded value, None if the frame does not have it
+
+        """
+        return _decode_value(self.line, '"{}"'.format(name), 0)
+
+    def get_state(self):
+        """Decodes the whole frame
+
+        Returns:
+            The frame's decoded json object, which should not be modified
+        """
+        return decode_json(self.line)
+
+    def __decode_events(self, name):
+        """
+        Decodes only the named event list, found by searching the frame from its events object onwards.
+        Unit lists only contain numbers and ids, so the key can not appear anywhere else after it.
+        """
+        start = self.line.find('"events"')
+        if start == -1:
+            return []
+        events = _decode_value(self.line, '"{}"'.format(name), start)
+        return [] if events is None else events
+
+
+def _decode_value(line, key, start):
+    """
+    Decodes the value of the first key found in line from start onwards, or returns None if there is none.
+    """
+    index = line.find(key, start)
+    if index == -1:
+        return None
+    index = line.index(":", index + len(key)) + 1
+    while line[index] in _WHITESPACE:
+        index += 1
+    value, _ = _value_decoder.raw_decode(line, index)
+    return value
+
+
+class ActionPhaseSummary:
+    """What happened during the action phase of a turn, gathered from its frames
+
+    Attributes:
+        * turn_number (int): The turn whose action phase this summarizes
+        * frames (int): The number of frames received
+        * breaches (list): A (location, player_index, unit_type) tuple for every unit that scored on a player
+        * destroyed (list): A (location, player_index, unit_type) tuple for every unit destroyed, not counting ones removed by their owner
+        * enemy_spawns (list): A (unit_type, x, y) tuple for every unit your opponent built or deployed, like GameState._build_stack
+
+    """
+    def __init__(self, turn_number):
+        self.turn_number = turn_number
+        self.frames = 0
+        self.breaches = []
+        self.destroyed = []
+        self.enemy_spawns = []
+
+    def add_frame(self, frame):
+        """Adds the events of a frame to the summary
+
+        Args:
+            * frame: An ActionFrame of this turn
+
+        """
+        self.frames += 1
+        unit_types = [unit_information.get("shorthand") for unit_information in frame.config["unitInformation"]]
+        breached = set()
+        for location, damage, type_index, unit_id, player in frame.get_events("breach"):
+            self.breaches.append((location, player - 1, unit_types[type_index]))
+            breached.add(unit_id)
+        for location, type_index, unit_id, player, removed in frame.get_events("death"):
+            # Units that breach are reported dead in the same frame
+            if not removed and unit_id not in breached:
+                self.destroyed.append((location, player - 1, unit_types[type_index]))
+        for location, type_index, unit_id, player in frame.get_events("spawn"):
+            if player == 2:
+                self.enemy_spawns.append((unit_types[type_index], location[0], location[1]))
+
+    def __toString(self):
+        return "Turn {} action phase: {} frames, {} breaches, {} destroyed, {} enemy spawns".format(
+            self.turn_number, self.frames, len(self.breaches), len(self.destroyed), len(self.enemy_spawns))
+
+    def __str__(self):
+        return self.__toString()
+
+    def __repr__(self):
+        return self.__toString()
@@ -1,4 +1,5 @@
 from .game_state import GameState, GameUnit
+from .game_map import ARENA_LOCATIONS
 import sys
 import warnings
 
@@ -6,6 +7,16 @@ class AdvancedGameState(GameState):
     """A version of gamestate with access to a few more advanced functions
 
     """
+    def __init__(self, config, serialized_string):
+        super().__init__(config, serialized_string)
+        self._coverage_maps = {}
+
+    def clone(self):
+        new_state = super().clone()
+        # Cached maps are keyed by map revision, which stays valid in the clone until it changes
+        new_state._coverage_maps = dict(self._coverage_maps)
+        return new_state
+
     def get_target(self, attacking_unit):
         """Returns target of given unit based on current map of the game board. 
         A Unit can often have many other units in range, and Units that attack do so once each frame.
@@ -21,7 +32,7 @@ class AdvancedGameState(GameState):
 
         """
         
-        from .game_state import SCRAMBLER, is_stationary
+        from .game_state import SCRAMBLER
 
         if not isinstance(attacking_unit, GameUnit):
             warnings.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.".format(type(attacking_unit)))
@@ -41,7 +52,7 @@ class AdvancedGameState(GameState):
                 """
                 NOTE: scrambler units cannot attack firewalls so skip them if unit is firewall
                 """
-                if unit.player_index == attacking_unit.player_index or (attacking_unit.unit_type == SCRAMBLER and is_stationary(unit)):
+                if unit.player_index == attacking_unit.player_index or (attacking_unit.unit_type == SCRAMBLER and unit.stationary):
                     continue
 
                 new_target = False
@@ -112,3 +123,153 @@ class AdvancedGameState(GameState):
                 if unit.unit_type == DESTRUCTOR and unit.player_index != player_index:
                     attackers.append(unit)
         return attackers
+
+    def threat_map(self, player_index):
+        """Gets the damage per frame enemy destructors deal to a unit on each tile
+
+        The map is cached and only rebuilt after the game map changes. Do not modify it.
+
+        Args:
+            * player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            A 2 dimensional list indexed like the map, so threat[x][y] is the damage per frame a unit
+            controlled by the given player would take at [x, y]
+
+        """
+
+        from .game_state import DESTRUCTOR, UNIT_TYPE_TO_INDEX
+
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+
+        destructor_info = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[DESTRUCTOR]]
+        return self._get_coverage_map(DESTRUCTOR, 1 - player_index, destructor_info["damage"])
+
+    def get_path_damage(self, path, player_index):
+        """Gets the damage per frame a unit would take summed over every location of a path
+
+        Args:
+            * path: A list of locations, such as the result of find_path_to_edge
+            * player_index: The index corresponding to the player controlling the unit, 0 for you 1 for the enemy
+
+        Returns:
+            The sum of the threat_map values along the path. Multiply by the frames a unit spends on each tile
+            (1 / speed) to estimate the total damage it takes
+
+        """
+        threat = self.threat_map(player_index)
+        return sum(threat[x][y] for x, y in path)
+
+    def shield_map(self, player_index):
+        """Gets the shield friendly encryptors would give a unit on each tile
+
+        The map is cached and only rebuilt after the game map changes. Do not modify it.
+
+        Args:
+            * player_index: The index corresponding to the player controlling the unit and encryptors, 0 for you 1 for the enemy
+
+        Returns:
+            A 2 dimensional list indexed like the map, so shield[x][y] is the total shield the given
+            player's encryptors in range of [x, y] can give
+
+        """
+
+        from .game_state import ENCRYPTOR, UNIT_TYPE_TO_INDEX
+
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+
+        encryptor_info = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[ENCRYPTOR]]
+        return self._get_coverage_map(ENCRYPTOR, player_index, encryptor_info["shieldAmount"])
+
+    def get_path_shielding(self, path, player_index, unit_type=None):
+        """Gets the total shield a unit collects while following a path
+
+        Each encryptor only shields a unit once, the first time the unit comes in range.
+
+        Args:
+            * path: A list of locations, such as the result of find_path_to_edge
+            * player_index: The index corresponding to the player controlling the unit, 0 for you 1 for the enemy
+            * unit_type: If given, shields decay by shieldDecayPerFrame for every frame this information unit type needs to reach the end of the path
+
+        Returns:
+            The shield the unit would have collected, after decay if unit_type is given. 0 if unit_type is not an information unit
+
+        """
+
+        from .game_state import ENCRYPTOR, UNIT_TYPE_TO_INDEX, ALL_UNITS, is_stationary
+
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+        # Only information units move, so only they have a speed
+        if unit_type is not None and (unit_type not in ALL_UNITS or is_stationary(unit_type)):
+            self._invalid_unit(unit_type)
+            return 0
+
+        encryptor_info = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[ENCRYPTOR]]
+        shield_amount = encryptor_info["shieldAmount"]
+        frames_per_tile = 0
+        if unit_type is not None:
+            frames_per_tile = 1 / self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]["speed"]
+        decay_per_tile = self.config["mechanics"]["shieldDecayPerFrame"] * frames_per_tile
+
+        sources = self._get_shield_sources(player_index, encryptor_info["range"])
+        collected = set()
+        total = 0
+        for step, (x, y) in enumerate(path):
+            for encryptor in sources[x][y]:
+                if encryptor not in collected:
+                    collected.add(encryptor)
+                    total += max(0, shield_amount - decay_per_tile * (len(path) - 1 - step))
+        return total
+
+    def _get_shield_sources(self, player_index, shield_range):
+        """
+        Gets, for each tile, the locations of the given player's encryptors that have it in range. Cached like the coverage maps.
+        """
+
+        from .game_state import ENCRYPTOR
+
+        key = ("sources", player_index)
+        cached = self._coverage_maps.get(key)
+        if cached is not None and cached[0] == self.game_map.revision:
+            return cached[1]
+
+        sources = [[() for _ in range(self.ARENA_SIZE)] for _ in range(self.ARENA_SIZE)]
+        for encryptor in self._get_unit_locations(ENCRYPTOR, player_index):
+            for x, y in self.game_map.get_locations_in_range(encryptor, shield_range):
+                sources[x][y] += (tuple(encryptor),)
+        self._coverage_maps[key] = (self.game_map.revision, sources)
+        return sources
+
+    def _get_coverage_map(self, unit_type, owner_index, value):
+        """
+        Builds a map of value times the number of units of the given type and owner in range of each tile,
+        cached until the game map changes.
+        """
+
+        from .game_state import UNIT_TYPE_TO_INDEX
+
+        key = (unit_type, owner_index)
+        cached = self._coverage_maps.get(key)
+        if cached is not None and cached[0] == self.game_map.revision:
+            return cached[1]
+
+        unit_range = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]["range"]
+        coverage = self.game_map.get_range_coverage(self._get_unit_locations(unit_type, owner_index), unit_range)
+        coverage_map = [[count * value for count in column] for column in coverage]
+        self._coverage_maps[key] = (self.game_map.revision, coverage_map)
+        return coverage_map
+
+    def _get_unit_locations(self, unit_type, owner_index):
+        """
+        Gets the locations of every unit of the given type controlled by the given player.
+        """
+        locations = []
+        # Not iterating the map itself, which would reset an algo's own loop over it
+        for x, y in ARENA_LOCATIONS:
+            for unit in self.game_map[x, y]:
+                if unit.unit_type == unit_type and unit.player_index == owner_index:
+                    locations.append([x, y])
+        return locations
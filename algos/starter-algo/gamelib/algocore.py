@@ -1,17 +1,43 @@
-import json
+import math
+import threading
+import time
 
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .util import get_raw_command, debug_write, BANNER_TEXT, send_command, decode_json, peek_turn_info, get_transport, set_transport
+from .unit import get_type_stats
+from .turn_budget import TurnBudget
+from .action_frame import ActionFrame, ActionPhaseSummary
+from .background import BackgroundTask, current_task
 
 class AlgoCore(object):
     """This class handles communication with the game itself. Your strategy should subclass it.
 
     Attributes:
         * config (JSON): json object containing information about the game
+        * transport: How the algo talks to the game, stdin and stdout if None. See gamelib.transport
+        * turn_time_limit (float): The seconds a turn may take. Read from the config's soft time limit unless set
+        * turn_safety_margin (float): The seconds kept in reserve, to submit the turn before the time limit
+        * turn_budget (:obj: TurnBudget): Times the current turn
+        * turn_timings (list): The TurnBudget of every finished turn
+        * summarize_action_phase (bool): Whether to gather an ActionPhaseSummary of every action phase
+        * action_phase_summary (:obj: ActionPhaseSummary): The summary of the latest action phase, when summarize_action_phase is set
+        * precomputed: What precompute returned after the previous turn, None if it was not overridden or did not finish in time
+        * precompute_wait (float): The seconds a turn waits for precompute to finish before starting without it
 
     """
     def __init__(self):
         self.config = None
+        self.transport = None
+        self.turn_time_limit = None
+        self.turn_safety_margin = 0.5
+        self.turn_budget = None
+        self.turn_timings = []
+        self._submit_lock = threading.Lock()
+        self.summarize_action_phase = False
+        self.action_phase_summary = None
+        self.precomputed = None
+        self.precompute_wait = 0
+        self._precompute_task = None
 
     def on_game_start(self, config):
         """
@@ -27,9 +53,114 @@ class AlgoCore(object):
         """
         self.submit_default_turn()
 
+    def on_action_frame(self, frame):
+        """
+        Override this to follow the action phase. It is called with an ActionFrame for every frame
+        the game sends, and before the summary of the action phase includes the frame.
+        Frames are only decoded when this is overridden or summarize_action_phase is set.
+        """
+        pass
+
+    def precompute(self, game_state):
+        """
+        Override this to prepare the next turn while the action phase plays out. It is called on a background thread
+        with the same string as on_turn, once on_turn returns and the turn is submitted, and what it returns is
+        self.precomputed during the next on_turn. Work that runs long should check precompute_cancelled and stop
+        once it returns True, because its result will be thrown away.
+        """
+        return None
+
+    def precompute_cancelled(self):
+        """Checks whether the precompute calling this was given up on, because the next turn started without it
+
+        Returns:
+            True if the result of precompute will not be used
+        """
+        task = current_task()
+        return task is not None and task.cancelled.is_set()
+
     def submit_default_turn(self):
+        send_command("", flush=False)
         send_command("")
-        send_command("")
+
+    def submit_anytime(self, game_state, plans):
+        """Submits the best plan that is ready before the turn's deadline
+
+        plans is usually a generator that plans the turn in steps, a coarse plan first and then better ones,
+        yielding a GameState with the complete turn planned after each step. The last plan yielded before the
+        deadline is submitted with submit_turn. If a step is still running at the deadline, a watchdog thread
+        submits the best plan so far, and the remaining steps are skipped.
+
+        Args:
+            * game_state: The GameState of this turn, submitted unchanged if no plan is ready in time
+            * plans: An iterable of GameStates, each better than the last
+
+        """
+        budget = self.turn_budget
+        if budget is None or budget.finished is not None:
+            budget = self.turn_budget = TurnBudget(game_state.turn_number, self.__get_turn_time_limit())
+        best = [game_state.clone()]
+        transport = get_transport()
+
+        def submit(forced):
+            # The watchdog runs on its own thread, which has to talk to the game the same way
+            set_transport(transport)
+            with self._submit_lock:
+                if budget.submitted is not None:
+                    return
+                budget.submitted = time.monotonic()
+                budget.forced = forced
+                best[0].submit_turn()
+
+        # Without a time limit there is no deadline to watch, and Timer can not wait forever
+        watchdog = None
+        if not math.isinf(budget.remaining()):
+            watchdog = threading.Timer(max(0, budget.remaining()), submit, (True,))
+            watchdog.daemon = True
+            watchdog.start()
+        forced = False
+        try:
+            for plan in plans:
+                if budget.submitted is not None:
+                    break
+                # A copy, so the strategy can keep changing its plan while the watchdog may submit it
+                best[0] = plan.clone()
+                budget.steps += 1
+                if budget.expired():
+                    forced = True
+                    break
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            submit(forced)
+            if hasattr(plans, "close"):
+                plans.close()
+
+    def __get_turn_time_limit(self):
+        if self.turn_time_limit is not None:
+            return self.turn_time_limit - self.turn_safety_margin
+        return float("inf")
+
+    def __handle_action_frame(self, line, turn_info):
+        frame = ActionFrame(self.config, line, turn_info)
+        self.on_action_frame(frame)
+        if self.summarize_action_phase:
+            if self.action_phase_summary is None or self.action_phase_summary.turn_number != frame.turn_number:
+                self.action_phase_summary = ActionPhaseSummary(frame.turn_number)
+            self.action_phase_summary.add_frame(frame)
+
+    def __collect_precomputed(self):
+        task = self._precompute_task
+        self._precompute_task = None
+        self.precomputed = None
+        if task is None:
+            return
+        self.precomputed = task.result(self.precompute_wait)
+        if not task.done():
+            task.cancel()
+            debug_write("Precompute did not finish before turn {}".format(self.turn_budget.turn_number))
+        elif task.error is not None:
+            debug_write("Precompute failed: {!r}".format(task.error))
 
     # only override this function if you have a 
     def start(self):
@@ -38,45 +169,66 @@ class AlgoCore(object):
         Python will hang on the readline() statement so actually this program will run forever unless manually stopped or
         it receives the "End" turn message from the game.
         """
+        set_transport(self.transport)
         debug_write(BANNER_TEXT)
 
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
-            game_state_string = get_command()
-            if "replaySave" in game_state_string:
-                """
-                This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
-                """
-                parsed_config = json.loads(game_state_string)
-                self.on_game_start(parsed_config)
-            elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
-                if stateType == 0:
-                    """
-                    This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
-                    deploy phase. Printing is handled by the provided functions.
-                    """
-                    self.on_turn(game_state_string)
-                elif stateType == 1:
-                    """
-                    If stateType == 1, this game_state_string string represents the results of an action phase
+            line = get_raw_command()
+            received = time.monotonic()
+            # Only the start of the line is read to tell what it is, most lines are action frames that are skipped
+            turn_info = peek_turn_info(line)
+            if turn_info is None:
+                if b"replaySave" in line:
                     """
-                    continue
-                elif stateType == 2:
+                    This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
                     """
-                    This is the end game message. This means the game is over so break and finish the program.
-                    """
-                    debug_write("Got end state quitting bot.")
-                    break
+                    parsed_config = decode_json(line)
+                    # Build the shared unit type records once, before any unit is created
+                    get_type_stats(parsed_config)
+                    if self.turn_time_limit is None:
+                        timing = parsed_config.get("timingAndReplay", {})
+                        if "waitTimeBotSoft" in timing:
+                            self.turn_time_limit = timing["waitTimeBotSoft"] / 1000
+                    self.on_game_start(parsed_config)
                 else:
                     """
                     Something is wrong? Recieved an incorrect or imporperly formatted string.
                     """
-                    debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
+                    debug_write("Got unexpected string : {}".format(line.decode("utf-8", "replace")))
+                continue
+
+            stateType = turn_info[0]
+            if stateType == 0:
+                """
+                This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
+                deploy phase. Printing is handled by the provided functions.
+                """
+                self.turn_budget = TurnBudget(turn_info[1], self.__get_turn_time_limit(), received)
+                self.__collect_precomputed()
+                game_state = line.decode("utf-8")
+                self.on_turn(game_state)
+                self.turn_budget.finish()
+                self.turn_timings.append(self.turn_budget)
+                if self.turn_budget.finished > self.turn_budget.deadline:
+                    debug_write("{} took longer than its budget".format(self.turn_budget))
+                if type(self).precompute is not AlgoCore.precompute:
+                    self._precompute_task = BackgroundTask(self.precompute, game_state)
+            elif stateType == 1:
+                """
+                If stateType == 1, this line represents the results of an action phase
+                """
+                if self.summarize_action_phase or type(self).on_action_frame is not AlgoCore.on_action_frame:
+                    self.__handle_action_frame(line.decode("utf-8"), turn_info)
+            elif stateType == 2:
+                """
+                This is the end game message. This means the game is over so break and finish the program.
+                """
+                debug_write("Got end state quitting bot.")
+                break
             else:
                 """
                 Something is wrong? Recieved an incorrect or imporperly formatted string.
                 """
-                debug_write("Got unexpected string : {}".format(game_state_string))
+                debug_write("Got unexpected string with turnInfo: {}".format(line.decode("utf-8", "replace")))
@@ -0,0 +1,67 @@
+import threading
+
+# Lets a running function find its own task, see current_task
+_running = threading.local()
+
+
+def current_task():
+    """Gets the BackgroundTask running on this thread
+
+    Returns:
+        The BackgroundTask, or None when called outside of one
+    """
+    return getattr(_running, "task", None)
+
+
+class BackgroundTask:
+    """Runs a function on a daemon thread and keeps what it returns
+
+    Python threads only run one at a time, so this pays off when the main thread is waiting,
+    like AlgoCore while it waits for the game to send the next line.
+
+    Attributes:
+        * cancelled (threading.Event): Set by cancel. Long running functions should check it and give up early
+        * error (Exception): What the function raised, None if it did not
+
+    """
+    def __init__(self, function, *args):
+        """Starts running function(*args)
+
+        Args:
+            * function: The function to run
+            * args: Its arguments
+
+        """
+        self.cancelled = threading.Event()
+        self.error = None
+        self._result = None
+        self._thread = threading.Thread(target=self.__run, args=(function, args), daemon=True)
+        self._thread.start()
+
+    def __run(self, function, args):
+        _running.task = self
+        try:
+            self._result = function(*args)
+        except Exception as error:
+            self.error = error
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def result(self, timeout=0):
+        """Gets what the function returned, waiting for it to finish for at most timeout seconds
+
+        Args:
+            * timeout: The number of seconds to wait
+
+        Returns:
+            What the function returned, or None if it is not done or raised an error
+
+        """
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            return None
+        return self._result
+
+    def cancel(self):
+        self.cancelled.set()
@@ -0,0 +1,250 @@
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import time
+import threading
+import traceback
+import warnings
+from collections import namedtuple
+
+from .game_map import ARENA_SIZE
+from .game_state import GameState
+from .simulator import ActionPhaseSimulator
+from .transport import QueueTransport
+
+"""
+The outcome of a match. winner is 1 or 2, or 0 for a draw. health, computation_time and crashed
+are indexed by player, [0] for the first algo. computation_time is the total milliseconds each algo took.
+"""
+MatchResult = namedtuple("MatchResult", ["winner", "turns", "health", "computation_time", "crashed"])
+
+_NO_EVENTS = {"selfDestruct": [], "breach": [], "damage": [], "shield": [], "move": [], "spawn": [], "death": [], "attack": [], "melee": []}
+
+
+def _run_algo(algo, transport):
+    """
+    Runs an algo's game loop on its own thread, talking to the engine through transport.
+    """
+    algo.transport = transport
+    try:
+        algo.start()
+    except Exception:
+        traceback.print_exc()
+    finally:
+        transport.disconnect()
+
+
+def _mirror(stack):
+    return [(unit_type, ARENA_SIZE - 1 - x, ARENA_SIZE - 1 - y) for unit_type, x, y in stack]
+
+
+class LocalEngine:
+    """Plays matches between two algos in this process, standing in for engine.jar
+
+    Each algo runs its AlgoCore.start loop on a thread of its own, with a QueueTransport as its transport. Every turn, each algo is sent the state from its own perspective, as player 1,
+    and the action phase is played out with ActionPhaseSimulator, so matches follow its model of the game.
+    Algos are asked for their turns one after the other, which keeps matches repeatable.
+    No action frames are sent, only the state at the start of each turn and at the end of the game.
+
+    Attributes:
+        * config (JSON): Contains information about the game. It is sent to the algos, so it should be a full game config
+        * max_turns (int): Matches end after this many turns
+        * turn_time_limit (float): The seconds an algo has for its turn before it counts as crashed
+
+    """
+    def __init__(self, config, max_turns=100, turn_time_limit=None, max_frames=1000, debug=False):
+        """Sets up the engine
+
+        Args:
+            * config (JSON): Contains information about the game
+            * max_turns: Matches end after this many turns
+            * turn_time_limit: The seconds an algo has for its turn. Read from the config's hard time limit unless given
+            * max_frames: Action phases stop after this many frames
+            * debug: Whether to show what the algos print with debug_write, which is hidden by default
+
+        """
+        self.config = config
+        self.max_turns = max_turns
+        if turn_time_limit is None:
+            turn_time_limit = config.get("timingAndReplay", {}).get("waitTimeBotMax", 50000) / 1000
+        self.turn_time_limit = turn_time_limit
+        self.debug = debug
+        self._simulator = ActionPhaseSimulator(config, max_frames)
+        self._unit_types = [unit_information.get("shorthand") for unit_information in config["unitInformation"]]
+        self._remove = self._unit_types[6]
+
+    def play(self, algo_1, algo_2):
+        """Plays a match
+
+        Args:
+            * algo_1: The AlgoCore playing as player 1, whose game has not started
+            * algo_2: The AlgoCore playing as player 2
+
+        Returns:
+            A MatchResult
+
+        """
+        transports = [QueueTransport(), QueueTransport()]
+        threads = [threading.Thread(target=_run_algo, args=(algo, transport), daemon=True)
+                   for algo, transport in zip([algo_1, algo_2], transports)]
+        with contextlib.ExitStack() as stack:
+            if not self.debug:
+                stack.enter_context(contextlib.redirect_stderr(stack.enter_context(open(os.devnull, "w"))))
+            for thread in threads:
+                thread.start()
+            try:
+                return self.__play(transports)
+            finally:
+                for transport in transports:
+                    transport.close()
+                for thread in threads:
+                    thread.join(1)
+
+    def __play(self, transports):
+        resources = self.config["resources"]
+        health = [float(resources["startingHP"])] * 2
+        cores = [float(resources["startingCores"])] * 2
+        bits = [float(resources["startingBits"])] * 2
+        times = [0, 0]
+        crashed = [False, False]
+        board = None
+
+        config_line = json.dumps(self.config)
+        for transport in transports:
+            transport.send(config_line)
+
+        turn = 0
+        while turn < self.max_turns and min(health) > 0:
+            lines = [self.__state_line(player, [0, turn, -1], board, health, cores, bits, times) for player in range(2)]
+            states = []
+            for player, transport in enumerate(transports):
+                started = time.monotonic()
+                transport.send(lines[player])
+                turn_lines = []
+                for _ in range(2):
+                    line = transport.receive(max(0, started + self.turn_time_limit - time.monotonic()))
+                    if line is None:
+                        crashed[player] = True
+                        break
+                    turn_lines.append(line)
+                times[player] += int((time.monotonic() - started) * 1000)
+                if not crashed[player]:
+                    states.append(self.__apply_turn(lines[player], *turn_lines))
+            if any(crashed):
+                break
+
+            # The board is kept from player 1's perspective
+            enemy = states[1]
+            enemy_builds = _mirror([spawn for spawn in enemy._build_stack if spawn[0] != self._remove])
+            result = self._simulator.simulate(states[0], _mirror(enemy._deploy_stack), enemy_builds)
+            board = result.game_state.game_map
+            for player in range(2):
+                health[player] -= result.damage_to_player[player]
+                state = states[player]
+                cores[player] = (state.get_resource(state.CORES) + resources["coresPerRound"]
+                                 + resources["coresForPlayerDamage"] * result.damage_to_player[1 - player])
+                remaining_bits = state.get_resource(state.BITS)
+                gained = resources["bitsPerRound"] + (turn + 1) // resources["turnIntervalForBitSchedule"]
+                bits[player] = round(remaining_bits * (1 - resources["bitDecayPerRound"]) + gained, 1)
+
+            for x, y in board:
+                if any(not unit.stationary for unit in board[x, y]):
+                    board[x, y] = [unit for unit in board[x, y] if unit.stationary]
+            removals = [[spawn for spawn in states[0]._build_stack if spawn[0] == self._remove],
+                        _mirror([spawn for spawn in enemy._build_stack if spawn[0] == self._remove])]
+            for player, stack in enumerate(removals):
+                for _, x, y in stack:
+                    units = board[x, y]
+                    if units and units[0].player_index == player:
+                        unit = units[0]
+                        cores[player] += unit.cost * self.config["mechanics"]["destroyOwnUnitRefund"] * unit.stability / unit.max_stability
+                        board.remove_unit([x, y])
+            turn += 1
+
+        if crashed[0] != crashed[1]:
+            winner = 2 if crashed[0] else 1
+        elif health[0] != health[1]:
+            winner = 1 if health[0] > health[1] else 2
+        else:
+            winner = 0
+        for player, transport in enumerate(transports):
+            if not crashed[player]:
+                end_stats = {"winner": winner if player == 0 or winner == 0 else 3 - winner, "turns": turn}
+                transport.send(self.__state_line(player, [2, turn, 0], board, health, cores, bits, times, end_stats))
+        return MatchResult(winner, turn, health, times, crashed)
+
+    def __apply_turn(self, state_line, build_line, deploy_line):
+        """
+        Plays a submitted turn on the state it was submitted for, keeping only the valid parts like the engine does.
+        """
+        state = GameState(self.config, state_line)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for line in [build_line, deploy_line]:
+                try:
+                    spawns = json.loads(line)
+                except ValueError:
+                    continue
+                for spawn in spawns if isinstance(spawns, list) else []:
+                    try:
+                        unit_type, x, y = spawn
+                        if unit_type == self._remove:
+                            state.attempt_remove([int(x), int(y)])
+                        else:
+                            state.attempt_spawn(unit_type, [int(x), int(y)])
+                    except (TypeError, ValueError, IndexError, KeyError):
+                        continue
+        return state
+
+    def __state_line(self, player, turn_info, board, health, cores, bits, times, end_stats=None):
+        """
+        Gets the state sent to an algo, from its own perspective. Unit ids are not kept from turn to turn.
+        """
+        units = [[[] for _ in self._unit_types], [[] for _ in self._unit_types]]
+        if board is not None:
+            unit_id = 0
+            for x, y in board:
+                for unit in board[x, y]:
+                    unit_id += 1
+                    if player == 0:
+                        units[unit.player_index][self._unit_types.index(unit.unit_type)].append([x, y, unit.stability, str(unit_id)])
+                    else:
+                        units[1 - unit.player_index][self._unit_types.index(unit.unit_type)].append(
+                            [ARENA_SIZE - 1 - x, ARENA_SIZE - 1 - y, unit.stability, str(unit_id)])
+        me, enemy = player, 1 - player
+        state = {"p2Units": units[1], "turnInfo": turn_info,
+                 "p1Stats": [health[me], cores[me], bits[me], times[me]], "p1Units": units[0],
+                 "p2Stats": [health[enemy], cores[enemy], bits[enemy], times[enemy]], "events": _NO_EVENTS}
+        if end_stats is not None:
+            state["endStats"] = end_stats
+        return json.dumps(state)
+
+
+def _play_match(arguments):
+    config, algo_types, seed, options = arguments
+    algos = [algo_type() for algo_type in algo_types]
+    # After the algos are made, since strategies may seed random themselves
+    random.seed(seed)
+    return LocalEngine(config, **options).play(*algos)
+
+
+def play_matches(config, algo_types, matches, processes=None, seed=0, **options):
+    """Plays many matches between two algos on a pool of processes
+
+    Args:
+        * config (JSON): Contains information about the game
+        * algo_types: The two AlgoCore subclasses to play, made without arguments for every match
+        * matches: The number of matches to play
+        * processes: The number of worker processes, one per core by default
+        * seed: Match i seeds random with seed + i, so the same matches can be played again
+        * options: Passed on to LocalEngine
+
+    Returns:
+        A MatchResult for each match, in order
+
+    """
+    tasks = [(config, tuple(algo_types), seed + match, options) for match in range(matches)]
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(_play_match, tasks, chunksize=1)
@@ -1,7 +1,82 @@
 import math
+import copy
+import itertools
 import warnings
 from .unit import GameUnit
 
+ARENA_SIZE = 28
+HALF_ARENA = 14
+
+
+def _in_diamond(x, y):
+    if y < HALF_ARENA:
+        return HALF_ARENA - 1 - y <= x <= HALF_ARENA + y
+    return y - HALF_ARENA <= x <= ARENA_SIZE - 1 + HALF_ARENA - y
+
+
+def _build_arena_tables():
+    locations = tuple((x, y) for y in range(ARENA_SIZE) for x in range(ARENA_SIZE) if _in_diamond(x, y))
+    in_bounds = bytearray(ARENA_SIZE * ARENA_SIZE)
+    for x, y in locations:
+        in_bounds[x * ARENA_SIZE + y] = 1
+
+    top_right = tuple((HALF_ARENA + num, ARENA_SIZE - 1 - num) for num in range(HALF_ARENA))
+    top_left = tuple((HALF_ARENA - 1 - num, ARENA_SIZE - 1 - num) for num in range(HALF_ARENA))
+    bottom_left = tuple((HALF_ARENA - 1 - num, num) for num in range(HALF_ARENA))
+    bottom_right = tuple((HALF_ARENA + num, num) for num in range(HALF_ARENA))
+    edges = (top_right, top_left, bottom_left, bottom_right)
+
+    return in_bounds, locations, edges, tuple(frozenset(edge) for edge in edges)
+
+
+"""
+Arena geometry never changes, so it is computed once and shared by every GameMap.
+    * IN_ARENA_BOUNDS (bytearray): 1 at index x * ARENA_SIZE + y if (x, y) is on the board, 0 otherwise
+    * ARENA_LOCATIONS (tuple): Every (x, y) on the board, ordered by row from the bottom, then left to right
+    * EDGE_LOCATIONS (tuple): The (x, y) tuples of each edge, indexed like GameMap.get_edges
+    * EDGE_LOCATION_SETS (tuple): A frozenset of the (x, y) tuples of each edge, for membership checks
+"""
+IN_ARENA_BOUNDS, ARENA_LOCATIONS, EDGE_LOCATIONS, EDGE_LOCATION_SETS = _build_arena_tables()
+
+# Revision numbers are unique across all maps, so a revision identifies the contents of a map even between clones
+_revisions = itertools.count(1)
+
+# Offsets covered by each radius, and the in bounds locations covered from each arena location
+_range_stencils = {}
+_range_footprints = {}
+
+
+def _get_range_stencil(radius, scan_bounds=False):
+    """
+    Gets the offsets in range of a location. With scan_bounds, only the offsets get_locations_in_range has always scanned,
+    from -ceil(radius) to floor(radius) on each axis, which leaves out part of the circle when the radius is fractional.
+    """
+    key = (radius, scan_bounds)
+    stencil = _range_stencils.get(key)
+    if stencil is None:
+        if scan_bounds:
+            low, high = -math.ceil(radius), math.floor(radius)
+        else:
+            reach = int(radius + 0.51) + 1
+            low, high = -reach, reach
+        # A unit with a given range affects all locations who's centers are within that range + 0.51
+        stencil = tuple((dx, dy) for dx in range(low, high + 1) for dy in range(low, high + 1)
+                        if math.sqrt(dx ** 2 + dy ** 2) < radius + 0.51)
+        _range_stencils[key] = stencil
+    return stencil
+
+
+def _get_range_footprint(x, y, radius, scan_bounds=False):
+    key = (radius, x, y, scan_bounds)
+    footprint = _range_footprints.get(key)
+    if footprint is None:
+        footprint = tuple((x + dx) * ARENA_SIZE + y + dy for dx, dy in _get_range_stencil(radius, scan_bounds)
+                          if 0 <= x + dx < ARENA_SIZE and 0 <= y + dy < ARENA_SIZE
+                          and IN_ARENA_BOUNDS[(x + dx) * ARENA_SIZE + y + dy])
+        _range_footprints[key] = footprint
+    return footprint
+
+
 class GameMap:
     """Holds data about the current game map and provides functions
     useful for getting information related to the map.
@@ -11,6 +86,9 @@ class GameMap:
     the x,y coordinates specified in the first two indices. So getting the 2nd
     of 3 units located at (12, 13) would look like: `unit = instance_of_game_map[12,13][1]`
 
+    add_unit, remove_unit and item assignment never modify a tile's list in place, they replace it.
+    This lets clone() share every tile between maps until one of them changes it.
+
     Attributes:
         * config (JSON): Contains information about the game
         * ARENA_SIZE (int): The size of the arena.
@@ -19,6 +97,8 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challange! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * revision (int): Changes every time the map is changed through add_unit, remove_unit, item assignment or undo.
+          Two maps with the same revision have the same contents.
 
     """
     def __init__(self, config):
@@ -36,7 +116,16 @@ class GameMap:
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
         self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        self.__start = 0
+        self.__blocked_tiles = None
+        # The number of units on each tile when the layout was cached, at index x * ARENA_SIZE + y
+        self.__tile_sizes = None
+        self.__owned_columns = bytearray(b"\x01" * self.ARENA_SIZE)
+        # The old unit lists of changed tiles, only recorded while a checkpoint is open
+        self.__undo_log = None
+        # Where the open checkpoints start in the undo log
+        self.__checkpoints = []
+        self.revision = next(_revisions)
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
@@ -46,26 +135,20 @@ class GameMap:
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+            self.__set_tile(location[0], location[1], val)
             return
         self._invalid_coordinates(location)
 
     def __iter__(self):
-        self.__start = [13,0]
+        self.__start = 0
         return self
     
     def __next__(self):
-        location = self.__start
-        if location == [15,27]:
+        if self.__start == len(ARENA_LOCATIONS):
             raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        x, y = ARENA_LOCATIONS[self.__start]
+        self.__start += 1
+        return [x, y]
 
     def __empty_grid(self):
         grid = []
@@ -75,6 +158,84 @@ class GameMap:
                 grid[x].append([])
         return grid
 
+    def __set_tile(self, x, y, units):
+        """
+        Replaces the unit list of a tile, copying its column first if it is shared with a clone, and records the old list if it can be undone.
+        """
+        if not self.__owned_columns[x]:
+            self.__map[x] = list(self.__map[x])
+            self.__owned_columns[x] = 1
+        if self.__undo_log is not None:
+            self.__undo_log.append((x, y, self.__map[x][y]))
+        self.__map[x][y] = units
+        self.__map_changed()
+
+    def __map_changed(self):
+        self.__blocked_tiles = None
+        self.revision = next(_revisions)
+
+    def clone(self):
+        """Makes a copy of the map that can be changed without affecting this one
+
+        The copy is cheap: the board is shared and each column is only copied once either map changes it.
+        Units are shared as well, so change a unit's attributes by replacing it rather than modifying it,
+        and do not modify the unit lists returned by indexing either map directly.
+
+        Returns:
+            A new GameMap with the same units, and no open checkpoints
+
+        """
+        new_map = copy.copy(self)
+        new_map.__map = list(self.__map)
+        new_map.__owned_columns = bytearray(self.ARENA_SIZE)
+        new_map.__undo_log = None
+        new_map.__checkpoints = []
+        self.__owned_columns = bytearray(self.ARENA_SIZE)
+        return new_map
+
+    def checkpoint(self):
+        """Marks the current state of the map so it can be restored with undo
+
+        Changes are only recorded while a checkpoint is open, and a checkpoint stays open until it is undone.
+        Checkpoints can be nested.
+
+        Returns:
+            A checkpoint to pass to undo
+        """
+        if self.__undo_log is None:
+            self.__undo_log = []
+        self.__checkpoints.append(len(self.__undo_log))
+        return self.__checkpoints[-1]
+
+    def undo(self, checkpoint=0):
+        """Reverts every change made through add_unit, remove_unit or item assignment since a checkpoint
+
+        This closes the checkpoint and any taken after it, so take a new checkpoint to revert again.
+        Once no checkpoint is open, changes stop being recorded.
+
+        Args:
+            * checkpoint: A value returned by checkpoint. Defaults to the first open checkpoint.
+
+        """
+        undo_log = self.__undo_log
+        if undo_log is None:
+            return
+        while self.__checkpoints and self.__checkpoints[-1] > checkpoint:
+            self.__checkpoints.pop()
+        if self.__checkpoints and self.__checkpoints[-1] == checkpoint:
+            self.__checkpoints.pop()
+        changed = len(undo_log) > checkpoint
+        while len(undo_log) > checkpoint:
+            x, y, units = undo_log.pop()
+            if not self.__owned_columns[x]:
+                self.__map[x] = list(self.__map[x])
+                self.__owned_columns[x] = 1
+            self.__map[x][y] = units
+        if not self.__checkpoints:
+            self.__undo_log = None
+        if changed:
+            self.__map_changed()
+
     def _invalid_coordinates(self, location):
         warnings.warn("{} is out of bounds.".format(str(location)))
 
@@ -89,19 +250,37 @@ class GameMap:
         
         """
         x, y = location
-        half_board = self.HALF_ARENA
+        if type(x) is int and type(y) is int and 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE:
+            return IN_ARENA_BOUNDS[x * ARENA_SIZE + y] == 1
+        return _in_diamond(x, y)
 
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
+    def get_blocked_tiles(self):
+        """Gets the layout of stationary units on the map
 
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
+        The layout is cached until the map is changed, so the same bytes object is returned for an unchanged board
+        and can be used as a cheap dictionary key. Units added to or removed from a tile's list directly, rather than
+        through add_unit, remove_unit or item assignment, are noticed here by the number of units on each tile,
+        and the map's revision changes with them.
 
-        return bottom_half_check or top_half_check
+        Returns:
+            A bytes object of length ARENA_SIZE * ARENA_SIZE with a 1 at index x * ARENA_SIZE + y
+            for every location holding a stationary unit, 0 otherwise
+
+        """
+        if self.__blocked_tiles is not None and self.__tile_sizes != list(map(len, itertools.chain.from_iterable(self.__map))):
+            # A tile's unit list was changed in place
+            self.__map_changed()
+        if self.__blocked_tiles is None:
+            self.__tile_sizes = list(map(len, itertools.chain.from_iterable(self.__map)))
+            blocked = bytearray(self.ARENA_SIZE * self.ARENA_SIZE)
+            for x, column in enumerate(self.__map):
+                for y, units in enumerate(column):
+                    for unit in units:
+                        if unit.stationary:
+                            blocked[x * self.ARENA_SIZE + y] = 1
+                            break
+            self.__blocked_tiles = bytes(blocked)
+        return self.__blocked_tiles
 
     def get_edge_locations(self, quadrant_description):
         """Takes in an edge description and returns a list of locations.
@@ -120,8 +299,7 @@ class GameMap:
         if not quadrant_description in [self.TOP_LEFT, self.TOP_RIGHT, self.BOTTOM_LEFT, self.BOTTOM_RIGHT]:
             warnings.warn("Passed invalid quadrent_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
 
-        edges = self.get_edges()
-        return edges[quadrant_description]
+        return [[x, y] for x, y in EDGE_LOCATIONS[quadrant_description]]
 
     def get_edges(self):
         """Gets all of the edges and their edge locations
@@ -130,27 +308,7 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
+        return [[[x, y] for x, y in edge] for edge in EDGE_LOCATIONS]
     
     def add_unit(self, unit_type, location, player_index=0):
         """Add a single GameUnit to the map at the given location.
@@ -171,9 +329,9 @@ class GameMap:
         x, y = location
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
         if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+            self.__set_tile(x, y, self.__map[x][y] + [new_unit])
         else:
-            self.__map[x][y] = [new_unit]
+            self.__set_tile(x, y, [new_unit])
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -188,7 +346,7 @@ class GameMap:
             self._invalid_coordinates(location)
         
         x, y = location
-        self.__map[x][y] = []
+        self.__set_tile(x, y, [])
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -197,6 +355,9 @@ class GameMap:
             * location: The center of our search area
             * radius: The radius of our search area
 
+        For a fractional radius, only locations up to floor(radius) away along each axis are found on the side of larger x
+        and y, so the area is not quite symmetric. Integer radii, like unit ranges, find the whole circle.
+
         Returns:
             The locations that are within our search area
 
@@ -207,6 +368,11 @@ class GameMap:
             self._invalid_coordinates(location)
 
         x, y = location
+        if radius < 0:
+            return []
+        if type(x) is int and type(y) is int and self.in_arena_bounds(location):
+            return [[index // ARENA_SIZE, index % ARENA_SIZE] for index in _get_range_footprint(x, y, radius, True)]
+
         locations = []
         for i in range(int(x - radius), int(x + radius + 1)):
             for j in range(int(y - radius), int(y + radius + 1)):
@@ -216,6 +382,30 @@ class GameMap:
                     locations.append(new_location)
         return locations
 
+    def get_range_coverage(self, locations, radius):
+        """Counts, for every tile, how many of the given locations have it in range
+
+        Equivalent to calling get_locations_in_range for each location and counting the results, but much faster.
+
+        Args:
+            * locations: A list of locations, for example the locations of every enemy destructor
+            * radius: The radius around each location
+
+        Returns:
+            A 2 dimensional list indexed like the map, so coverage[x][y] is the number of locations with [x, y] in range
+
+        """
+        coverage = [0] * (ARENA_SIZE * ARENA_SIZE)
+        for location in locations:
+            x, y = location
+            if type(x) is int and type(y) is int and self.in_arena_bounds(location):
+                for index in _get_range_footprint(x, y, radius, True):
+                    coverage[index] += 1
+            else:
+                for i, j in self.get_locations_in_range(location, radius):
+                    coverage[i * ARENA_SIZE + j] += 1
+        return [coverage[x * ARENA_SIZE:(x + 1) * ARENA_SIZE] for x in range(ARENA_SIZE)]
+
     def distance_between_locations(self, location_1, location_2):
         """Euclidean distance
 
@@ -1,11 +1,14 @@
 import math
+import copy
 import json
+import threading
 import warnings
+from collections import OrderedDict
 
-from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
+from .navigation import FastShortestPathFinder
+from .util import send_command, debug_write, decode_json
 from .unit import GameUnit
-from .game_map import GameMap
+from .game_map import GameMap, EDGE_LOCATION_SETS
 
 def is_stationary(unit_type):
     return unit_type in FIREWALL_TYPES
@@ -28,6 +31,7 @@ class GameState:
         * HALF_ARENA (int): Half the size of the arena
         * BITS (int): A constant representing the bits resource
         * CORES (int): A constant representing the cores resource
+        * PATH_CACHE_SIZE (int): The number of paths remembered by find_path_to_edge
          
         * game_map (:obj: GameMap): The current GameMap
         * turn_number (int): The current turn number. Starts at 0.
@@ -42,7 +46,8 @@ class GameState:
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string): A string containing information about the game state at the start of this turn.
+              The already decoded dictionary is also accepted.
 
         """
         self.serialized_string = serialized_string
@@ -72,9 +77,13 @@ class GameState:
         self.HALF_ARENA = int(self.ARENA_SIZE / 2)
         self.BITS = 0
         self.CORES = 1
+        self.PATH_CACHE_SIZE = 512
 
         self.game_map = GameMap(self.config)
-        self._shortest_path_finder = ShortestPathFinder()
+        self._shortest_path_finder = FastShortestPathFinder()
+        self._path_cache = OrderedDict()
+        # Clones share the path cache, and may be used from other threads, like precompute's
+        self._path_cache_lock = threading.Lock()
         self._build_stack = []
         self._deploy_stack = []
         self._player_resources = [
@@ -85,9 +94,9 @@ class GameState:
     def __parse_state(self, state_line):
         """
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        state_line is the game state as a json string, or the dictionary it decodes to.
         """
-        state = json.loads(state_line)
+        state = state_line if isinstance(state_line, dict) else decode_json(state_line)
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -116,16 +125,19 @@ class GameState:
         """
         typedef = self.config.get("unitInformation")
         for i, unit_types in enumerate(units):
+            if not unit_types:
+                continue
+            unit_type = typedef[i].get("shorthand")
             for uinfo in unit_types:
-                unit_type = typedef[i].get("shorthand")
-                sx, sy, shp = uinfo[:3]
-                x, y = map(int, [sx, sy])
-                hp = float(shp)
+                x, y = int(uinfo[0]), int(uinfo[1])
+                hp = float(uinfo[2])
+                tile = self.game_map[x,y]
                 # This depends on RM always being the last type to be processed
                 if unit_type == REMOVE:
-                    self.game_map[x,y][0].pending_removal = True
-                unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                self.game_map[x,y].append(unit)
+                    # RM only flags the firewall already on this tile, it is not a unit itself
+                    tile[0].pending_removal = True
+                    continue
+                tile.append(GameUnit(unit_type, self.config, player_number, hp, x, y))
 
     def __resource_required(self, unit_type):
         return self.CORES if is_stationary(unit_type) else self.BITS
@@ -155,9 +167,52 @@ class GameState:
         """
         build_string = json.dumps(self._build_stack)
         deploy_string = json.dumps(self._deploy_stack)
-        send_command(build_string)
+        # Both lines go out together
+        send_command(build_string, flush=False)
         send_command(deploy_string)
 
+    def clone(self):
+        """Makes a copy of the game state for exploring hypothetical turns
+
+        The copy shares the config and, until either changes them, the map's tiles and units
+        (see GameMap.clone). Spawns, removals and resource changes made on the copy do not
+        affect this game state. Call submit_turn on the copy whose turn you want to play.
+
+        Returns:
+            A new game state of the same class
+
+        """
+        new_state = copy.copy(self)
+        new_state.game_map = self.game_map.clone()
+        new_state._build_stack = list(self._build_stack)
+        new_state._deploy_stack = list(self._deploy_stack)
+        new_state._player_resources = [dict(resources) for resources in self._player_resources]
+        return new_state
+
+    def checkpoint(self):
+        """Marks the current map, resources and planned turn so they can be restored with undo
+
+        Like GameMap.checkpoint, the checkpoint stays open until it is undone.
+
+        Returns:
+            A checkpoint to pass to undo
+        """
+        return (self.game_map.checkpoint(), len(self._build_stack), len(self._deploy_stack),
+                [dict(resources) for resources in self._player_resources])
+
+    def undo(self, checkpoint):
+        """Reverts every spawn, removal and map change made since a checkpoint
+
+        Args:
+            * checkpoint: A value returned by checkpoint
+
+        """
+        map_checkpoint, build_length, deploy_length, resources = checkpoint
+        self.game_map.undo(map_checkpoint)
+        del self._build_stack[build_length:]
+        del self._deploy_stack[deploy_length:]
+        self._player_resources = [dict(player_resources) for player_resources in resources]
+
     def get_resource(self, resource_type, player_index = 0):
         """Gets a players resources
 
@@ -273,7 +328,8 @@ class GameState:
         stationary = is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        on_edge = (tuple(location) in EDGE_LOCATION_SETS[self.game_map.BOTTOM_LEFT] or
+                   tuple(location) in EDGE_LOCATION_SETS[self.game_map.BOTTOM_RIGHT])
 
         return (affordable and correct_territory and not blocked and
                 (stationary or on_edge) and
@@ -351,12 +407,80 @@ class GameState:
             A list of locations corresponding to the path the unit would take 
             to get from it's starting location to the best available end location
 
+        Paths are cached by the layout of stationary units, see GameMap.get_blocked_tiles, so repeated queries
+        on an unchanged board are cheap. The cache is shared with clones of this game state.
+
         """
         if self.contains_stationary_unit(start_location):
             warnings.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
             return
-        end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        key = (self.game_map.get_blocked_tiles(), int(start_location[0]), int(start_location[1]), target_edge)
+        path = self._get_cached_path(key)
+        if path is None:
+            end_points = self.game_map.get_edge_locations(target_edge)
+            path = self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+            path = [list(location) for location in path]
+            self._cache_path(key, path)
+        return [list(location) for location in path]
+
+    def find_paths_to_edge(self, target_edge, start_locations=None):
+        """Gets the paths units at many locations would take to the same edge
+
+        This is much faster than calling find_path_to_edge for each location, since the
+        distances to the edge are only computed once for all of them.
+
+        Args:
+            * target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+            * start_locations: A list of locations of hypothetical units. Defaults to every location on your edges.
+
+        Returns:
+            A list with the path for each start location, in the same order as start_locations.
+            The entry is None for locations blocked by a stationary unit.
+
+        """
+        if start_locations is None:
+            start_locations = (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) +
+                               self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        layout = self.game_map.get_blocked_tiles()
+        paths = [None] * len(start_locations)
+        uncached = []
+        for i, location in enumerate(start_locations):
+            if self.contains_stationary_unit(location):
+                continue
+            path = self._get_cached_path((layout, int(location[0]), int(location[1]), target_edge))
+            if path is None:
+                uncached.append(i)
+            else:
+                paths[i] = path
+
+        if uncached:
+            end_points = self.game_map.get_edge_locations(target_edge)
+            found = self._shortest_path_finder.navigate_from_many([start_locations[i] for i in uncached], end_points, self)
+            for i, path in zip(uncached, found):
+                path = [list(location) for location in path]
+                self._cache_path((layout, int(start_locations[i][0]), int(start_locations[i][1]), target_edge), path)
+                paths[i] = path
+
+        return [[list(location) for location in path] if path is not None else None for path in paths]
+
+    def _get_cached_path(self, key):
+        """
+        Gets a path from the least recently used path cache, marking it as recently used. None if it is not cached.
+        """
+        with self._path_cache_lock:
+            path = self._path_cache.get(key)
+            if path is not None:
+                self._path_cache.move_to_end(key)
+            return path
+
+    def _cache_path(self, key, path):
+        """
+        Stores a path in the least recently used path cache, evicting the oldest entries when full.
+        """
+        with self._path_cache_lock:
+            self._path_cache[key] = path
+            while len(self._path_cache) > self.PATH_CACHE_SIZE:
+                self._path_cache.popitem(last=False)
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked
@@ -2,7 +2,9 @@ import heapq
 import math
 import sys
 import queue
+from collections import deque
 from .util import debug_write
+from .game_map import ARENA_SIZE, HALF_ARENA, ARENA_LOCATIONS, IN_ARENA_BOUNDS
 
 class Node:
     """A pathfinding node
@@ -299,3 +301,418 @@ class ShortestPathFinder:
             sys.stderr.write(" ")
         sys.stderr.write(str(number))
         sys.stderr.write(" ")
+
+
+"""
+Lookup tables shared by every FastShortestPathFinder. Tiles are addressed by a
+flat index, x * ARENA_SIZE + y, so the board fits in a single bytearray.
+"""
+def _build_tables():
+    # Neighbors are stored in the same order as ShortestPathFinder._get_neighbors,
+    # up, down, right, left, so ties are broken identically.
+    neighbors = [()] * (ARENA_SIZE * ARENA_SIZE)
+    for x, y in ARENA_LOCATIONS:
+        adjacent = []
+        for nx, ny in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+            if 0 <= nx < ARENA_SIZE and 0 <= ny < ARENA_SIZE and IN_ARENA_BOUNDS[nx * ARENA_SIZE + ny]:
+                adjacent.append(nx * ARENA_SIZE + ny)
+        neighbors[x * ARENA_SIZE + y] = tuple(adjacent)
+
+    # One idealness table per target direction, keyed by (x direction, y direction)
+    idealness = {}
+    for dx in (1, -1):
+        for dy in (1, -1):
+            table = [0] * (ARENA_SIZE * ARENA_SIZE)
+            for x, y in ARENA_LOCATIONS:
+                table[x * ARENA_SIZE + y] = (28 * y if dy == 1 else 28 * (27 - y)) + (x if dx == 1 else 27 - x)
+            idealness[(dx, dy)] = table
+
+    return neighbors, idealness
+
+
+_NEIGHBORS, _IDEALNESS = _build_tables()
+
+
+class FastShortestPathFinder:
+    """Handles pathfinding using flat arrays instead of Node objects.
+
+    Produces exactly the same paths as ShortestPathFinder, but the board is read from
+    GameMap.get_blocked_tiles, neighbors come from a precomputed table and both
+    breadth first searches run on a deque.
+
+    Attributes:
+        * HORIZONTAL (int): A constant representing a horizontal movement
+        * VERTICAL (int): A constant representing a vertical movement
+
+    """
+    def __init__(self):
+        self.HORIZONTAL = 1
+        self.VERTICAL = 2
+
+    def navigate_multiple_endpoints(self, start_point, end_points, game_state):
+        """Finds tha path a unit would take to reach a set of endpoints
+
+        Args:
+            * start_point: The starting location of the unit
+            * end_points: The end points of the unit, should be a list of edge locations
+            * game_state: The current game state
+
+        Returns:
+            The path a unit at start_point would take when trying to reach end_points given the current game state.
+            Note that this path can change if a tower is destroyed during pathing, or if you or your enemy places firewalls.
+
+        """
+        if game_state.contains_stationary_unit(start_point):
+            return
+
+        blocked = game_state.game_map.get_blocked_tiles()
+        end_indices = [x * ARENA_SIZE + y for x, y in end_points]
+        direction = self._get_direction_from_endpoints(end_points)
+        start = start_point[0] * ARENA_SIZE + start_point[1]
+
+        ideal = self._idealness_search(start, end_indices, blocked, _IDEALNESS[direction])
+        pathlength = [-1] * (ARENA_SIZE * ARENA_SIZE)
+        self._validate(end_indices if ideal in end_indices else (ideal,), blocked, pathlength)
+        return self._get_path(start_point, pathlength, blocked, direction)
+
+    def navigate_from_many(self, start_points, end_points, game_state):
+        """Finds the paths units at many starting locations would take to reach the same set of endpoints
+
+        The pathlengths towards end_points are computed once and shared by every start point.
+        Only start points that cannot reach any endpoint need a search of their own, and that
+        search is shared with every other start point in the same pocket.
+
+        Args:
+            * start_points: A list of starting locations
+            * end_points: The end points of the units, should be a list of edge locations
+            * game_state: The current game state
+
+        Returns:
+            A list with, for each start point, the path navigate_multiple_endpoints would return for it.
+            The entry is None for start points that hold a stationary unit.
+
+        """
+        blocked = game_state.game_map.get_blocked_tiles()
+        end_indices = [x * ARENA_SIZE + y for x, y in end_points]
+        direction = self._get_direction_from_endpoints(end_points)
+        idealness = _IDEALNESS[direction]
+
+        pathlength = [-1] * (ARENA_SIZE * ARENA_SIZE)
+        self._validate(end_indices, blocked, pathlength)
+
+        paths = []
+        for start_point in start_points:
+            start = start_point[0] * ARENA_SIZE + start_point[1]
+            if blocked[start]:
+                paths.append(None)
+                continue
+            if pathlength[start] == -1:
+                # This pocket cannot reach the edge, so units in it path to its most ideal tile instead
+                self._validate((self._idealness_search(start, end_indices, blocked, idealness),), blocked, pathlength)
+            paths.append(self._get_path(start_point, pathlength, blocked, direction))
+        return paths
+
+    def _get_direction_from_endpoints(self, end_points):
+        """Returns the direction (x, y) of the edge end_points belongs to, for example (1, 1) for the top right
+        """
+        x, y = end_points[0]
+        return (-1 if x < HALF_ARENA else 1, -1 if y < HALF_ARENA else 1)
+
+    def _idealness_search(self, start, end_indices, blocked, idealness):
+        """
+        Finds the index of the most ideal tile in our 'pocket' of pathable space.
+        The first edge tile reached if the edge is available, or the best self destruct location otherwise
+        """
+        end_set = set(end_indices)
+        if start in end_set:
+            return start
+
+        visited = bytearray(ARENA_SIZE * ARENA_SIZE)
+        visited[start] = 1
+        best_idealness = idealness[start]
+        most_ideal = start
+
+        current = deque((start,))
+        while current:
+            for neighbor in _NEIGHBORS[current.popleft()]:
+                if visited[neighbor] or blocked[neighbor]:
+                    continue
+                if neighbor in end_set:
+                    return neighbor
+                visited[neighbor] = 1
+                if idealness[neighbor] > best_idealness:
+                    best_idealness = idealness[neighbor]
+                    most_ideal = neighbor
+                current.append(neighbor)
+
+        return most_ideal
+
+    def _validate(self, seeds, blocked, pathlength):
+        """Breadth first search of the grid from the seed tiles, filling in pathlength (-1 if unreachable)
+        """
+        for index in seeds:
+            pathlength[index] = 0
+
+        current = deque(seeds)
+        while current:
+            index = current.popleft()
+            if blocked[index]:
+                continue
+            next_pathlength = pathlength[index] + 1
+            for neighbor in _NEIGHBORS[index]:
+                if pathlength[neighbor] == -1 and not blocked[neighbor]:
+                    pathlength[neighbor] = next_pathlength
+                    current.append(neighbor)
+
+    def _get_path(self, start_point, pathlength, blocked, direction):
+        """Once all tiles are validated, and a target is found, the unit can path to its target
+        """
+        path = [start_point]
+        current = start_point[0] * ARENA_SIZE + start_point[1]
+        move_direction = 0
+
+        while not pathlength[current] == 0:
+            next_move = self._choose_next_move(current, move_direction, pathlength, blocked, direction)
+            if current // ARENA_SIZE == next_move // ARENA_SIZE:
+                move_direction = self.VERTICAL
+            else:
+                move_direction = self.HORIZONTAL
+            path.append(list(divmod(next_move, ARENA_SIZE)))
+            current = next_move
+
+        return path
+
+    def _choose_next_move(self, current, previous_move_direction, pathlength, blocked, direction):
+        """Given the current tile index, return the index of the best 'next step' for a given unit to take
+        """
+        ideal_neighbor = current
+        best_pathlength = pathlength[current]
+        for neighbor in _NEIGHBORS[current]:
+            if blocked[neighbor]:
+                continue
+
+            current_pathlength = pathlength[neighbor]
+            if current_pathlength > best_pathlength:
+                continue
+            if (current_pathlength == best_pathlength and
+                    not self._better_direction(current, neighbor, ideal_neighbor, previous_move_direction, direction)):
+                continue
+
+            ideal_neighbor = neighbor
+            best_pathlength = current_pathlength
+
+        return ideal_neighbor
+
+    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, direction):
+        """Compare two tile indices and return True if the unit would rather move to the new one
+
+        Mirrors ShortestPathFinder._better_direction.
+        """
+        prev_x, prev_y = divmod(prev_tile, ARENA_SIZE)
+        new_x, new_y = divmod(new_tile, ARENA_SIZE)
+        best_x, best_y = divmod(prev_best, ARENA_SIZE)
+
+        if previous_move_direction == self.HORIZONTAL and not new_x == best_x:
+            return not prev_y == new_y
+        if previous_move_direction == self.VERTICAL and not new_y == best_y:
+            return not prev_x == new_x
+        if previous_move_direction == 0:
+            return not prev_y == new_y
+
+        if new_y == best_y:
+            return (direction[0] == 1 and new_x > best_x) or (direction[0] == -1 and new_x < best_x)
+        if new_x == best_x:
+            return (direction[1] == 1 and new_y > best_y) or (direction[1] == -1 and new_y < best_y)
+        return True
+
+
+class IncrementalPathField:
+    """Pathlengths towards a set of endpoints that are repaired, rather than recomputed, when a single tile changes
+
+    Intended for trying out firewall placements: block a tile, query paths, then roll the edit back.
+    Edits only change this field, never the GameMap it was built from.
+
+    Paths are identical to the ones FastShortestPathFinder returns on a board with the same edits applied.
+
+    Attributes:
+        * game_state (:obj: GameState): The game state the field was built from
+        * end_points (list): The end points units are trying to reach
+
+    """
+    def __init__(self, game_state, end_points):
+        """Computes the initial pathlengths
+
+        Args:
+            * game_state: The current game state
+            * end_points: The end points of the units, should be a list of edge locations
+
+        """
+        self.game_state = game_state
+        self.end_points = [list(location) for location in end_points]
+        self._finder = FastShortestPathFinder()
+        self._end_indices = [x * ARENA_SIZE + y for x, y in self.end_points]
+        self._end_set = set(self._end_indices)
+        self._direction = self._finder._get_direction_from_endpoints(self.end_points)
+        self._blocked = bytearray(game_state.game_map.get_blocked_tiles())
+        self._pathlength = [-1] * (ARENA_SIZE * ARENA_SIZE)
+        self._finder._validate(self._end_indices, self._blocked, self._pathlength)
+        self._history = []
+
+    def is_blocked(self, location):
+        """Check if a location is blocked in this field
+
+        Args:
+            * location: The location to check
+
+        Returns:
+            True if the location is blocked, either on the original map or by an edit
+        """
+        return bool(self._blocked[location[0] * ARENA_SIZE + location[1]])
+
+    def block(self, location):
+        """Places a hypothetical firewall at location and repairs the affected pathlengths
+
+        Args:
+            * location: The location to block
+
+        """
+        index = location[0] * ARENA_SIZE + location[1]
+        changes = []
+        self._history.append((index, self._blocked[index], changes))
+        if self._blocked[index]:
+            return
+        self._blocked[index] = 1
+
+        pathlength = self._pathlength
+        removed_pathlength = pathlength[index]
+        if index not in self._end_set:
+            changes.append((index, removed_pathlength))
+            pathlength[index] = -1
+        if removed_pathlength == -1:
+            return
+
+        # Find every tile whose pathlength only came through the blocked tile, in order of pathlength
+        orphans = set()
+        candidates = deque(self._successors(index, removed_pathlength))
+        queued = set(candidates)
+        while candidates:
+            tile = candidates.popleft()
+            tile_pathlength = pathlength[tile]
+            supported = False
+            for neighbor in _NEIGHBORS[tile]:
+                if (pathlength[neighbor] == tile_pathlength - 1 and not self._blocked[neighbor]
+                        and neighbor not in orphans):
+                    supported = True
+                    break
+            if supported:
+                continue
+            orphans.add(tile)
+            for successor in self._successors(tile, tile_pathlength):
+                if successor not in queued:
+                    queued.add(successor)
+                    candidates.append(successor)
+
+        for tile in orphans:
+            changes.append((tile, pathlength[tile]))
+            pathlength[tile] = -1
+
+        # Reconnect the orphans from their surviving neighbors, shortest first
+        frontier = []
+        for tile in orphans:
+            best = -1
+            for neighbor in _NEIGHBORS[tile]:
+                if neighbor in orphans or self._blocked[neighbor] or pathlength[neighbor] == -1:
+                    continue
+                if best == -1 or pathlength[neighbor] + 1 < best:
+                    best = pathlength[neighbor] + 1
+            if best != -1:
+                heapq.heappush(frontier, (best, tile))
+        while frontier:
+            tile_pathlength, tile = heapq.heappop(frontier)
+            if pathlength[tile] != -1:
+                continue
+            pathlength[tile] = tile_pathlength
+            for neighbor in _NEIGHBORS[tile]:
+                if neighbor in orphans and pathlength[neighbor] == -1:
+                    heapq.heappush(frontier, (tile_pathlength + 1, neighbor))
+
+    def unblock(self, location):
+        """Removes a firewall at location, hypothetical or not, and repairs the affected pathlengths
+
+        Args:
+            * location: The location to unblock
+
+        """
+        index = location[0] * ARENA_SIZE + location[1]
+        changes = []
+        self._history.append((index, self._blocked[index], changes))
+        if not self._blocked[index]:
+            return
+        self._blocked[index] = 0
+
+        pathlength = self._pathlength
+        if index not in self._end_set:
+            best = -1
+            for neighbor in _NEIGHBORS[index]:
+                if self._blocked[neighbor] or pathlength[neighbor] == -1:
+                    continue
+                if best == -1 or pathlength[neighbor] + 1 < best:
+                    best = pathlength[neighbor] + 1
+            if best == -1:
+                return
+            changes.append((index, pathlength[index]))
+            pathlength[index] = best
+
+        current = deque((index,))
+        while current:
+            tile = current.popleft()
+            next_pathlength = pathlength[tile] + 1
+            for neighbor in _NEIGHBORS[tile]:
+                if self._blocked[neighbor] or neighbor in self._end_set:
+                    continue
+                if pathlength[neighbor] == -1 or pathlength[neighbor] > next_pathlength:
+                    changes.append((neighbor, pathlength[neighbor]))
+                    pathlength[neighbor] = next_pathlength
+                    current.append(neighbor)
+
+    def rollback(self):
+        """Reverts the most recent block or unblock
+
+        Returns:
+            False if there was nothing to revert, True otherwise
+        """
+        if not self._history:
+            return False
+        index, was_blocked, changes = self._history.pop()
+        self._blocked[index] = was_blocked
+        for tile, old_pathlength in reversed(changes):
+            self._pathlength[tile] = old_pathlength
+        return True
+
+    def get_path(self, start_location):
+        """Gets the path a unit at a given location would take with the current edits applied
+
+        Args:
+            * start_location: The location of a hypothetical unit
+
+        Returns:
+            A list of locations corresponding to the path the unit would take, or None if start_location is blocked
+
+        """
+        start = start_location[0] * ARENA_SIZE + start_location[1]
+        if self._blocked[start]:
+            return
+        pathlength = self._pathlength
+        if pathlength[start] == -1:
+            # This pocket cannot reach the edge, search it on its own like FastShortestPathFinder would
+            ideal = self._finder._idealness_search(start, self._end_indices, self._blocked, _IDEALNESS[self._direction])
+            pathlength = [-1] * (ARENA_SIZE * ARENA_SIZE)
+            self._finder._validate((ideal,), self._blocked, pathlength)
+        return self._finder._get_path(start_location, pathlength, self._blocked, self._direction)
+
+    def _successors(self, tile, tile_pathlength):
+        """Unblocked, non endpoint neighbors of tile whose pathlength is one more than tile_pathlength
+        """
+        return [neighbor for neighbor in _NEIGHBORS[tile]
+                if self._pathlength[neighbor] == tile_pathlength + 1
+                and not self._blocked[neighbor] and neighbor not in self._end_set]
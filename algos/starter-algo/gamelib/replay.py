@@ -0,0 +1,141 @@
+import mmap
+import os
+
+from .action_frame import ActionFrame
+from .game_state import GameState
+from .util import decode_json, peek_turn_info
+
+
+class ReplayReader:
+    """Reads the frames of a replay file lazily
+
+    The file is memory mapped and its lines are indexed once, reading only the turnInfo of each one.
+    Frames are decoded when they are asked for, and then only the events and values that are used,
+    see ActionFrame. The state at the start of any turn can be loaded as a GameState with get_game_state.
+    Call close when done, or use it in a with statement.
+
+    Attributes:
+        * path (str): The replay file
+        * config (JSON): The config the game was played with, None if the replay has none
+
+    """
+    def __init__(self, path):
+        """Maps the file and indexes its frames
+
+        Args:
+            * path: The replay file
+
+        """
+        self.path = path
+        self.config = None
+        self._file = open(path, "rb")
+        # Empty files can not be mapped
+        if os.fstat(self._file.fileno()).st_size:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._data = b""
+        self._frames = []
+        # Where the state at the start of each turn is, by turn number
+        self._turns = {}
+        self.__index()
+
+    def __index(self):
+        """
+        Records where each frame starts and ends along with its turnInfo. Replays put a blank line between frames.
+        """
+        data = self._data
+        size = len(data)
+        start = 0
+        while start < size:
+            end = data.find(b"\n", start)
+            if end == -1:
+                end = size
+            if end > start + 1:
+                line = data[start:end]
+                turn_info = peek_turn_info(line)
+                if turn_info is not None:
+                    self._frames.append((start, end, turn_info))
+                    if turn_info[0] == 0:
+                        self._turns[turn_info[1]] = (start, end)
+                elif self.config is None and b'"unitInformation"' in line:
+                    self.config = decode_json(line.decode("utf-8"))
+            start = end + 1
+
+    def __len__(self):
+        return len(self._frames)
+
+    def frames(self, state_type=None, turn_number=None):
+        """Goes through the frames of the replay in order
+
+        Args:
+            * state_type: Only frames with this turnInfo type, 0 for the start of each turn, 1 for action frames and 2 for the end of the game
+            * turn_number: Only frames of this turn
+
+        Returns:
+            A generator of ActionFrames
+
+        """
+        for start, end, turn_info in self._frames:
+            if state_type is not None and turn_info[0] != state_type:
+                continue
+            if turn_number is not None and turn_info[1] != turn_number:
+                continue
+            yield ActionFrame(self.config, self._data[start:end].decode("utf-8"), turn_info)
+
+    def turn_numbers(self):
+        """Gets the turns the replay has a state for
+
+        Returns:
+            The turn numbers in order
+        """
+        return list(self._turns)
+
+    def get_game_state(self, turn_number, game_state_type=GameState):
+        """Loads the state of the game at the start of a turn, as the algo was given it
+
+        Only that turn's line is decoded, however far into the replay it is.
+
+        Args:
+            * turn_number: The turn to load
+            * game_state_type: The class to load it as, like GameState or AdvancedGameState
+
+        Returns:
+            A new game_state_type for the turn. Replays are saved from player 1's perspective
+
+        """
+        if turn_number not in self._turns:
+            raise KeyError("The replay has no turn {}".format(turn_number))
+        start, end = self._turns[turn_number]
+        return game_state_type(self.config, self._data[start:end].decode("utf-8"))
+
+    def end_stats(self):
+        """Gets the statistics the game records when it ends
+
+        Returns:
+            The decoded endStats, None if the replay stops before the game ended
+        """
+        for frame in self.frames(state_type=2):
+            end_stats = frame.get_value("endStats")
+            if end_stats is not None:
+                return end_stats
+        return None
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __toString(self):
+        return "Replay {}: {} frames".format(self.path, len(self._frames))
+
+    def __str__(self):
+        return self.__toString()
+
+    def __repr__(self):
+        return self.__toString()
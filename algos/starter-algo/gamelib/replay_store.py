@@ -0,0 +1,290 @@
+import array
+import json
+import mmap
+import os
+import sys
+
+from .replay import ReplayReader
+
+_MAGIC = b"terminal-replay-store 1\n"
+
+"""
+The columns of each table, as (name, array typecode) pairs. Every row of every table has the index of its game,
+and players are stored as indexes, 0 for player 1. Unit types are indexes into ReplayStore.unit_types.
+Event tables have a row for every event of every action frame, with the columns of the event in the order the game sends them.
+"""
+_SCHEMA = {
+    "games": (("game", "i"), ("winner", "b"), ("turns", "h"), ("frames", "i"), ("duration", "i"),
+              ("p1_points", "f"), ("p2_points", "f"), ("p1_computation_time", "i"), ("p2_computation_time", "i")),
+    "stats": (("game", "i"), ("turn", "h"), ("player", "b"), ("health", "f"), ("cores", "f"), ("bits", "f"), ("time", "i")),
+    "units": (("game", "i"), ("turn", "h"), ("player", "b"), ("unit_type", "b"), ("x", "b"), ("y", "b"), ("stability", "f"), ("unit_id", "i")),
+    "spawn": (("game", "i"), ("turn", "h"), ("frame", "h"), ("x", "b"), ("y", "b"), ("unit_type", "b"), ("unit_id", "i"), ("player", "b")),
+    "move": (("game", "i"), ("turn", "h"), ("frame", "h"), ("x", "b"), ("y", "b"), ("to_x", "b"), ("to_y", "b"),
+             ("unit_type", "b"), ("unit_id", "i"), ("player", "b")),
+    "damage": (("game", "i"), ("turn", "h"), ("frame", "h"), ("x", "b"), ("y", "b"), ("damage", "f"), ("unit_type", "b"),
+               ("unit_id", "i"), ("player", "b")),
+    "death": (("game", "i"), ("turn", "h"), ("frame", "h"), ("x", "b"), ("y", "b"), ("unit_type", "b"), ("unit_id", "i"),
+              ("player", "b"), ("removed", "b")),
+    "breach": (("game", "i"), ("turn", "h"), ("frame", "h"), ("x", "b"), ("y", "b"), ("damage", "f"), ("unit_type", "b"),
+               ("unit_id", "i"), ("player", "b")),
+    "shield": (("game", "i"), ("turn", "h"), ("frame", "h"), ("x", "b"), ("y", "b"), ("to_x", "b"), ("to_y", "b"), ("shield", "f"),
+               ("unit_type", "b"), ("unit_id", "i"), ("target_id", "i"), ("player", "b")),
+    "attack": (("game", "i"), ("turn", "h"), ("frame", "h"), ("x", "b"), ("y", "b"), ("to_x", "b"), ("to_y", "b"), ("damage", "f"),
+               ("unit_type", "b"), ("unit_id", "i"), ("target_id", "i"), ("player", "b")),
+}
+
+# Turn an event as the game sends it into the columns after game, turn and frame
+_EVENT_ROWS = {
+    "spawn": lambda event: (event[0][0], event[0][1], event[1], int(event[2]), event[3] - 1),
+    "move": lambda event: (event[0][0], event[0][1], event[1][0], event[1][1], event[3], int(event[4]), event[5] - 1),
+    "damage": lambda event: (event[0][0], event[0][1], event[1], event[2], int(event[3]), event[4] - 1),
+    "death": lambda event: (event[0][0], event[0][1], event[1], int(event[2]), event[3] - 1, int(event[4])),
+    "breach": lambda event: (event[0][0], event[0][1], event[1], event[2], int(event[3]), event[4] - 1),
+    "shield": lambda event: (event[0][0], event[0][1], event[1][0], event[1][1], event[2], event[3], int(event[4]), int(event[5]), event[6] - 1),
+    "attack": lambda event: (event[0][0], event[0][1], event[1][0], event[1][1], event[2], event[3], int(event[4]), int(event[5]), event[6] - 1),
+}
+
+
+def _empty_tables():
+    return {name: [array.array(typecode) for _, typecode in columns] for name, columns in _SCHEMA.items()}
+
+
+def _append(columns, row):
+    for column, value in zip(columns, row):
+        column.append(value)
+
+
+def _read_replay(path, game):
+    """
+    Reads the tables of one replay, with game as the game column.
+    Returns the tables and the replay's config.
+    """
+    tables = _empty_tables()
+    with ReplayReader(path) as reader:
+        for frame in reader.frames(state_type=0):
+            turn = frame.turn_number
+            for player, prefix in enumerate(["p1", "p2"]):
+                health, cores, bits, time = frame.get_value(prefix + "Stats")
+                _append(tables["stats"], (game, turn, player, health, cores, bits, int(time)))
+                for unit_type, units in enumerate(frame.get_value(prefix + "Units")):
+                    for x, y, stability, unit_id in units:
+                        _append(tables["units"], (game, turn, player, unit_type, x, y, stability, int(unit_id)))
+        frames = 0
+        for frame in reader.frames(state_type=1):
+            frames += 1
+            for name, make_row in _EVENT_ROWS.items():
+                columns = tables[name]
+                for event in frame.get_events(name):
+                    _append(columns, (game, frame.turn_number, frame.frame_number) + make_row(event))
+        end_stats = reader.end_stats() or {}
+        players = [end_stats.get("player1", {}), end_stats.get("player2", {})]
+        _append(tables["games"], (game, end_stats.get("winner", 0), end_stats.get("turns", -1), end_stats.get("frames", frames),
+                                  end_stats.get("duration", -1), players[0].get("points_scored", 0), players[1].get("points_scored", 0),
+                                  players[0].get("total_computation_time", -1), players[1].get("total_computation_time", -1)))
+        return tables, reader.config
+
+
+class ReplayTable:
+    """One table of a ReplayStore, stored by column
+
+    Attributes:
+        * name (str): The table's name
+        * column_names (list): The names of its columns, in order
+
+    """
+    def __init__(self, name, rows, columns):
+        """Called by ReplayStore.get_table
+
+        Args:
+            * name: The table's name
+            * rows: The number of rows
+            * columns: A (name, function) pair for each column, the function loading it as an array
+
+        """
+        self.name = name
+        self.column_names = [column_name for column_name, _ in columns]
+        self._rows = rows
+        self._loaders = dict(columns)
+        self._columns = {}
+
+    def __len__(self):
+        return self._rows
+
+    def get_column(self, name):
+        """Gets a whole column, loading it the first time
+
+        Args:
+            * name: The column's name
+
+        Returns:
+            An array.array with a value for every row
+        """
+        column = self._columns.get(name)
+        if column is None:
+            column = self._columns[name] = self._loaders[name]()
+        return column
+
+    def select(self, *names, **equal):
+        """Gets some columns of the rows that match
+
+        Only the columns that are asked for or filtered on are loaded. For example,
+        store.get_table("breach").select("x", "y", player=1) gets where player 2 scored.
+
+        Args:
+            * names: The columns to get
+            * equal: Column values the rows must have
+
+        Returns:
+            A tuple of values for each row that matches, in the order of names
+        """
+        selected = [self.get_column(name) for name in names]
+        if not equal:
+            return list(zip(*selected))
+        filters = [(self.get_column(name), value) for name, value in equal.items()]
+        if len(filters) == 1:
+            column, value = filters[0]
+            keep = [row for row, row_value in enumerate(column) if row_value == value]
+        else:
+            keep = [row for row in range(self._rows) if all(column[row] == value for column, value in filters)]
+        return [tuple(column[row] for column in selected) for row in keep]
+
+    def __toString(self):
+        return "{}: {} rows of {}".format(self.name, self._rows, ", ".join(self.column_names))
+
+    def __str__(self):
+        return self.__toString()
+
+    def __repr__(self):
+        return self.__toString()
+
+
+class ReplayStore:
+    """Many replays, converted into tables of fixed width columns for fast analysis
+
+    Make one with ReplayStore.convert. The file starts with a json header describing the tables,
+    followed by each column as the raw bytes of an array.array. Columns are only read when used.
+
+    The tables are "games", with the endStats of each game, "stats", with the stats of each player at the start of every turn,
+    "units", with every unit on the board at the start of every turn, and a table for each type of event:
+    "spawn", "move", "damage", "death", "breach", "shield" and "attack".
+
+    Attributes:
+        * path (str): The store's file
+        * replays (list): The replay file of each game, by the game column
+        * unit_types (list): The shorthand of each unit type, by the unit_type column
+        * table_names (list): The names of the tables
+
+    """
+    def __init__(self, path):
+        """Opens a store made with ReplayStore.convert
+
+        Args:
+            * path: The store's file
+
+        """
+        self.path = path
+        with open(path, "rb") as store:
+            if store.readline() != _MAGIC:
+                raise ValueError("{} is not a replay store".format(path))
+            header = json.loads(store.readline().decode("utf-8"))
+            data_start = store.tell()
+        self.replays = header["replays"]
+        self.unit_types = header["unitTypes"]
+        self._byteorder = header["byteorder"]
+        self._tables = header["tables"]
+        self.table_names = list(self._tables)
+        self._data_start = data_start
+        self._file = None
+        self._data = None
+
+    @staticmethod
+    def convert(replay_paths, path):
+        """Reads replays and writes them to a new store
+
+        Args:
+            * replay_paths: The replay files
+            * path: Where to write the store
+
+        Returns:
+            The new ReplayStore
+
+        """
+        tables = _empty_tables()
+        unit_types = []
+        replays = []
+        for replay_path in replay_paths:
+            game_tables, config = _read_replay(replay_path, len(replays))
+            replays.append(os.path.basename(replay_path))
+            if config is not None and not unit_types:
+                unit_types = [unit_information.get("shorthand") for unit_information in config["unitInformation"]]
+            for name, columns in game_tables.items():
+                for column, game_column in zip(tables[name], columns):
+                    column.extend(game_column)
+
+        header = {"replays": replays, "unitTypes": unit_types, "byteorder": sys.byteorder, "tables": {}}
+        offset = 0
+        for name, columns in tables.items():
+            described = []
+            for (column_name, typecode), column in zip(_SCHEMA[name], columns):
+                described.append([column_name, typecode, offset])
+                offset += len(column) * column.itemsize
+            header["tables"][name] = {"rows": len(columns[0]), "columns": described}
+        with open(path, "wb") as store:
+            store.write(_MAGIC)
+            store.write(json.dumps(header).encode("utf-8") + b"\n")
+            for columns in tables.values():
+                for column in columns:
+                    column.tofile(store)
+        return ReplayStore(path)
+
+    def get_table(self, name):
+        """Gets one of the tables
+
+        Args:
+            * name: The table's name, one of table_names
+
+        Returns:
+            A ReplayTable
+        """
+        table = self._tables[name]
+        rows = table["rows"]
+        return ReplayTable(name, rows, [(column_name, self.__column_loader(typecode, offset, rows))
+                                        for column_name, typecode, offset in table["columns"]])
+
+    def __column_loader(self, typecode, offset, rows):
+        def load():
+            column = array.array(typecode)
+            if rows:
+                start = self._data_start + offset
+                column.frombytes(self.__get_data()[start:start + rows * column.itemsize])
+                if self._byteorder != sys.byteorder:
+                    column.byteswap()
+            return column
+        return load
+
+    def __get_data(self):
+        if self._data is None:
+            self._file = open(self.path, "rb")
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._data
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._file.close()
+            self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __toString(self):
+        return "Replay store {}: {} games".format(self.path, len(self.replays))
+
+    def __str__(self):
+        return self.__toString()
+
+    def __repr__(self):
+        return self.__toString()
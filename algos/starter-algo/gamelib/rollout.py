@@ -0,0 +1,183 @@
+import json
+import math
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+
+from .advanced_game_state import AdvancedGameState
+from .game_state import GameState
+from .simulator import ActionPhaseSimulator
+from .unit import get_type_stats
+
+"""
+The outcome of one rollout. breaches and destroyed hold (unit_type, x, y, player_index) tuples,
+damage_to_player and damage_dealt are indexed by player like SimulationResult's.
+"""
+RolloutSummary = namedtuple("RolloutSummary", ["breaches", "damage_to_player", "damage_dealt", "destroyed", "frames"])
+
+# The bytes of shared memory a state is passed to the workers in. Larger states are sent with every task instead
+_STATE_BUFFER_SIZE = 1 << 20
+
+# Set up in each worker process by _init_worker
+_worker_config = None
+_worker_simulator = None
+_worker_shared_state = None
+_worker_board = (None, None)
+
+
+def _init_worker(config, max_frames, shared_state):
+    global _worker_config, _worker_simulator, _worker_shared_state
+    _worker_config = config
+    get_type_stats(config)
+    _worker_simulator = ActionPhaseSimulator(config, max_frames)
+    _worker_shared_state = shared_state
+
+
+def _get_worker_board(board):
+    """
+    Parses the board of a turn once per worker. board is either the number of the state in shared memory,
+    which is read from there the first time, or the state string itself.
+    Returns None if the shared state has already been replaced by a later one.
+    """
+    global _worker_board
+    if _worker_board[0] != board:
+        serialized_string = board
+        if isinstance(board, int):
+            lock, number, length, buffer = _worker_shared_state
+            with lock:
+                if number.value != board:
+                    return None
+                serialized_string = buffer[:length.value].decode("utf-8")
+        _worker_board = (board, AdvancedGameState(_worker_config, serialized_string))
+    return _worker_board[1]
+
+
+def _run_rollouts(board, plans, enemy_deploys, enemy_builds, deadline):
+    """
+    Simulates a chunk of plans in a worker process, skipping the ones it can not start before the deadline.
+    """
+    game_state = _get_worker_board(board)
+    if game_state is None:
+        # A task left over from an earlier call to evaluate, whose results are no longer waited for
+        return [None] * len(plans)
+    stats = get_type_stats(_worker_config)
+    # Removals only happen after the action phase
+    deploy_plans = [[spawn for spawn in build_stack + deploy_stack if spawn[0] in stats] for build_stack, deploy_stack in plans]
+    results = _worker_simulator.simulate_many(game_state, deploy_plans, enemy_deploys, enemy_builds, deadline)
+    return [None if result is None else _summarize(result) for result in results]
+
+
+def _summarize(result):
+    return RolloutSummary(
+        [(unit_type, location[0], location[1], player_index) for location, player_index, unit_type in result.breaches],
+        result.damage_to_player,
+        result.damage_dealt,
+        [(unit.unit_type, unit.x, unit.y, unit.player_index) for unit in result.destroyed],
+        result.frames)
+
+
+class RolloutPool:
+    """Simulates candidate turn plans in parallel on a pool of worker processes
+
+    Create one in on_game_start, since starting the workers is slow, and call evaluate from on_turn.
+    Workers simulate plans with ActionPhaseSimulator. The board is the state string the game sent for this turn,
+    which is put in shared memory once per turn, so tasks only carry their plans. Each worker parses it once per turn.
+
+    Attributes:
+        * config (JSON): Contains information about the game
+        * processes (int): The number of worker processes
+
+    """
+    def __init__(self, config, processes=None, max_frames=1000):
+        """Starts the worker processes
+
+        Args:
+            * config (JSON): Contains information about the game
+            * processes: The number of worker processes. Defaults to one less than the number of cores
+            * max_frames: Simulations stop after this many frames
+
+        """
+        self.config = config
+        self.processes = processes or max(1, (os.cpu_count() or 2) - 1)
+        # The state being evaluated: a lock, its number, its length and its bytes
+        self._shared_state = (multiprocessing.Lock(), multiprocessing.RawValue("l", 0), multiprocessing.RawValue("l", 0),
+                              multiprocessing.RawArray("c", _STATE_BUFFER_SIZE))
+        self._shared_string = None
+        self._pool = multiprocessing.Pool(self.processes, _init_worker, (config, max_frames, self._shared_state))
+
+    def evaluate(self, game_state, plans, timeout, enemy_deploys=(), enemy_builds=(), chunk_size=None):
+        """Simulates the action phase of each plan, returning whatever finished before the deadline
+
+        Plans are full turns on top of the board the game sent this turn, so changes made to
+        game_state through game_map are not seen by the workers.
+
+        Args:
+            * game_state: The GameState of this turn
+            * plans: A list of plans, each a GameState on which the turn was planned with attempt_spawn, like a clone of game_state, or a (build_stack, deploy_stack) tuple
+            * timeout: The number of seconds evaluate may take
+            * enemy_deploys: (unit_type, x, y) tuples of information units the enemy deploys, like GameState._deploy_stack
+            * enemy_builds: (unit_type, x, y) tuples of firewalls the enemy builds, like GameState._build_stack
+            * chunk_size: The number of plans sent to a worker at once. Smaller chunks waste less work at the deadline
+
+        Returns:
+            A RolloutSummary for each plan, in the same order, or None for plans that did not finish in time.
+
+        """
+        deadline = time.monotonic() + timeout
+        serialized_string = game_state.serialized_string
+        if isinstance(serialized_string, dict):
+            serialized_string = json.dumps(serialized_string)
+        board = self.__share_state(serialized_string)
+        plans = [(list(plan._build_stack), list(plan._deploy_stack)) if isinstance(plan, GameState) else plan
+                 for plan in plans]
+        if chunk_size is None:
+            chunk_size = max(1, int(math.ceil(len(plans) / (self.processes * 4))))
+
+        pending = []
+        for start in range(0, len(plans), chunk_size):
+            if time.monotonic() >= deadline:
+                break
+            chunk = plans[start:start + chunk_size]
+            pending.append((start, len(chunk), self._pool.apply_async(
+                _run_rollouts, (board, chunk, list(enemy_deploys), list(enemy_builds), deadline))))
+
+        results = [None] * len(plans)
+        for start, count, async_result in pending:
+            try:
+                results[start:start + count] = async_result.get(max(0, deadline - time.monotonic()))
+            except multiprocessing.TimeoutError:
+                # Results that arrive late are dropped, and workers skip plans they can not start in time
+                continue
+        return results
+
+    def __share_state(self, serialized_string):
+        """
+        Puts the state in shared memory, unless it is already there, and returns the number tasks refer to it by.
+        States that do not fit are returned as they are, to be sent with every task.
+        """
+        lock, number, length, buffer = self._shared_state
+        if serialized_string == self._shared_string:
+            return number.value
+        data = serialized_string.encode("utf-8")
+        if len(data) > len(buffer):
+            return serialized_string
+        with lock:
+            number.value += 1
+            length.value = len(data)
+            buffer[:len(data)] = data
+        self._shared_string = serialized_string
+        return number.value
+
+    def close(self):
+        """Stops the worker processes once they finish their tasks, which is quick since they skip plans past their deadline
+        """
+        # Pool.terminate can deadlock while tasks are still being sent to the workers
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
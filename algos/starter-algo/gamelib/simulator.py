@@ -0,0 +1,500 @@
+import itertools
+import math
+import time
+import warnings
+
+from .advanced_game_state import AdvancedGameState
+from .game_map import ARENA_SIZE, HALF_ARENA, EDGE_LOCATIONS, EDGE_LOCATION_SETS, _get_range_footprint
+from .navigation import FastShortestPathFinder, _IDEALNESS
+from .unit import GameUnit
+
+"""
+Edge constants, matching GameMap.TOP_RIGHT, GameMap.TOP_LEFT, GameMap.BOTTOM_LEFT and GameMap.BOTTOM_RIGHT
+"""
+_TOP_RIGHT, _TOP_LEFT, _BOTTOM_LEFT, _BOTTOM_RIGHT = range(4)
+
+
+class SimulationResult:
+    """The outcome of a simulated action phase
+
+    Attributes:
+        * breaches (list): A (location, player_index, unit_type) tuple for every unit that reached its target edge
+        * damage_to_player (list): The health lost by each player, [0] is you and [1] your opponent
+        * damage_dealt (list): The damage dealt to units by each player's units, including damage absorbed by shields
+        * destroyed (list): Every unit destroyed during the action phase, at the location it was destroyed
+        * self_destructs (list): A (location, player_index, unit_type) tuple for every unit that self destructed
+        * frames (int): The number of frames simulated
+        * game_state (:obj: AdvancedGameState): The board at the end of the action phase
+
+    """
+    def __init__(self):
+        self.breaches = []
+        self.damage_to_player = [0, 0]
+        self.damage_dealt = [0, 0]
+        self.destroyed = []
+        self.self_destructs = []
+        self.frames = 0
+        self.game_state = None
+
+    def __str__(self):
+        return "breaches: {}, damage to players: {}, destroyed: {}, frames: {}".format(
+            len(self.breaches), self.damage_to_player, len(self.destroyed), self.frames)
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class _Mover:
+    """The per unit state of an information unit during a simulation
+    """
+    __slots__ = ("unit", "edge", "period", "shields", "shielded_by", "steps", "move_direction")
+
+    def __init__(self, unit, edge, period):
+        self.unit = unit
+        self.edge = edge
+        self.period = period
+        self.shields = []
+        self.shielded_by = set()
+        self.steps = 0
+        self.move_direction = 0
+
+
+class _Board:
+    """The units on a board and the tiles their firewalls cover, shared by every simulation of that board
+
+    Firewalls are referred to by their position in firewalls, so simulations can look up their own copies.
+    A board can be made from a base board and some more units, in which case only what the new firewalls
+    cover is worked out, and the base board is left as it was.
+    """
+    def __init__(self, units, encryptor, destructor, base=None):
+        if base is None:
+            self.units = list(units)
+            self.firewalls = []
+            self.shielders = [[] for _ in range(ARENA_SIZE * ARENA_SIZE)]
+            self.attackers = [[] for _ in range(ARENA_SIZE * ARENA_SIZE)]
+            self.blocked = bytearray(ARENA_SIZE * ARENA_SIZE)
+        else:
+            self.units = base.units + list(units)
+            self.firewalls = list(base.firewalls)
+            # The tiles' lists are shared with the base board, so they are replaced rather than appended to
+            self.shielders = list(base.shielders)
+            self.attackers = list(base.attackers)
+            self.blocked = bytearray(base.blocked)
+        self._base = base
+        self._added = [unit for unit in units if unit.stationary]
+        for firewall in self._added:
+            ordinal = len(self.firewalls)
+            self.firewalls.append(firewall)
+            self.blocked[firewall.x * ARENA_SIZE + firewall.y] = 1
+            if firewall.unit_type == encryptor:
+                covered = self.shielders
+            elif firewall.unit_type == destructor:
+                covered = self.attackers
+            else:
+                continue
+            for index in _get_range_footprint(firewall.x, firewall.y, firewall.range):
+                covered[index] = covered[index] + [ordinal]
+        # The layout of firewalls, which pathing is cached by
+        self.layout = bytes(self.blocked)
+        self._reach = {}
+
+    def get_reach(self, radius, player_index):
+        """
+        Counts, for every tile, the firewalls player_index's units could attack from it with the given range.
+        """
+        key = (radius, player_index)
+        reach = self._reach.get(key)
+        if reach is None:
+            if self._base is None:
+                reach = [0] * (ARENA_SIZE * ARENA_SIZE)
+            else:
+                reach = list(self._base.get_reach(radius, player_index))
+            for firewall in self._added:
+                if firewall.player_index != player_index:
+                    for index in _get_range_footprint(firewall.x, firewall.y, radius):
+                        reach[index] += 1
+            self._reach[key] = reach
+        return reach
+
+
+class _Simulation:
+    """The state of a single simulated action phase
+    """
+    def __init__(self, simulator, board, deployed, field_cache):
+        self.simulator = simulator
+        self.board = board
+        self.field_cache = field_cache
+        self.result = SimulationResult()
+
+        # The simulation works on copies of the units in a flat list of tiles, indexed like the pathfinders
+        self.tiles = [[] for _ in range(ARENA_SIZE * ARENA_SIZE)]
+        self.blocked = bytearray(board.blocked)
+        self.movers = []
+        self.firewalls = []
+        self.movers_by_player = [0, 0]
+        for unit in board.units + deployed:
+            unit = _copy_unit(unit)
+            self.tiles[unit.x * ARENA_SIZE + unit.y].append(unit)
+            if unit.stationary:
+                self.firewalls.append(unit)
+                self.blocked[unit.x * ARENA_SIZE + unit.y] = 1
+            else:
+                self.movers.append(_Mover(unit, _target_edge(unit), int(round(1 / unit.speed))))
+                self.movers_by_player[unit.player_index] += 1
+        # In the same order as board.firewalls
+        self.ordinals = list(self.firewalls)
+        self.reach = {}
+        self.destroyed_firewalls = []
+        # Only deployed firewalls change the board's layout
+        layout = board.layout if self.blocked == board.blocked else bytes(self.blocked)
+        self.fields = field_cache.setdefault(layout, {})
+
+    def run(self, max_frames):
+        frame = 0
+        while self.movers and frame <= max_frames:
+            if frame > 0:
+                self.move(frame)
+            self.shield()
+            self.attack()
+            self.result.frames = frame
+            frame += 1
+        if self.movers:
+            warnings.warn("Simulation stopped after {} frames with units remaining".format(max_frames))
+        return self.result
+
+    def get_field(self, edge, start):
+        """
+        Gets the pathlengths towards an edge, extending them into start's pocket if it cannot reach the edge.
+        """
+        simulator = self.simulator
+        pathlength = self.fields.get(edge)
+        if pathlength is None:
+            pathlength = [-1] * (ARENA_SIZE * ARENA_SIZE)
+            simulator._finder._validate(simulator._end_indices[edge], self.blocked, pathlength)
+            self.fields[edge] = pathlength
+        if pathlength[start] == -1:
+            ideal = simulator._finder._idealness_search(start, simulator._end_indices[edge], self.blocked,
+                                                        _IDEALNESS[simulator._directions[edge]])
+            simulator._finder._validate((ideal,), self.blocked, pathlength)
+        return pathlength
+
+    def get_reach(self, unit):
+        key = (unit.range, unit.player_index)
+        reach = self.reach.get(key)
+        if reach is None:
+            reach = self.reach[key] = list(self.board.get_reach(*key))
+            for firewall in self.destroyed_firewalls:
+                self.remove_reach(reach, key, firewall)
+        return reach
+
+    def get_target(self, attacking_unit):
+        """
+        Picks the same target as AdvancedGameState.get_target, searching the simulation's tiles.
+        Destructors only ever attack information units, since they deal no damage to firewalls.
+        """
+        x = attacking_unit.x
+        y = attacking_unit.y
+        player_index = attacking_unit.player_index
+        unit_type = attacking_unit.unit_type
+        skip_firewalls = unit_type == self.simulator._scrambler or unit_type == self.simulator._destructor
+        tiles = self.tiles
+        target = None
+        target_key = None
+        for index in _get_range_footprint(x, y, attacking_unit.range):
+            for unit in tiles[index]:
+                if unit.player_index == player_index or (skip_firewalls and unit.stationary):
+                    continue
+                key = (unit.stationary, math.sqrt((unit.x - x) ** 2 + (unit.y - y) ** 2), unit.stability,
+                       unit.y, -abs(HALF_ARENA - 0.5 - unit.x))
+                if target_key is None or key < target_key:
+                    target = unit
+                    target_key = key
+        return target
+
+    def move(self, frame):
+        simulator = self.simulator
+        finder = simulator._finder
+        tiles = self.tiles
+        for mover in list(self.movers):
+            if (frame + 1) % mover.period:
+                continue
+            unit = mover.unit
+            current = unit.x * ARENA_SIZE + unit.y
+            if (unit.x, unit.y) in EDGE_LOCATION_SETS[mover.edge]:
+                self.remove_mover(mover)
+                self.result.breaches.append(([unit.x, unit.y], unit.player_index, unit.unit_type))
+                self.result.damage_to_player[1 - unit.player_index] += simulator._player_damage[unit.unit_type]
+                continue
+
+            pathlength = self.get_field(mover.edge, current)
+            if pathlength[current] == 0:
+                self.self_destruct(mover)
+                continue
+
+            next_move = finder._choose_next_move(current, mover.move_direction, pathlength, self.blocked, simulator._directions[mover.edge])
+            mover.move_direction = finder.VERTICAL if current // ARENA_SIZE == next_move // ARENA_SIZE else finder.HORIZONTAL
+            mover.steps += 1
+            tiles[current].remove(unit)
+            tiles[next_move].append(unit)
+            unit.x, unit.y = divmod(next_move, ARENA_SIZE)
+
+    def self_destruct(self, mover):
+        unit = mover.unit
+        self.remove_mover(mover)
+        self.result.self_destructs.append(([unit.x, unit.y], unit.player_index, unit.unit_type))
+        if mover.steps < self.simulator._self_destruct_steps:
+            return
+        # Range footprints reach 0.51 further than their radius, the explosion does not
+        for index in _get_range_footprint(unit.x, unit.y, self.simulator._self_destruct_radius - 0.51):
+            for target in self.tiles[index]:
+                if target.player_index != unit.player_index:
+                    target.stability -= unit.max_stability
+                    self.result.damage_dealt[unit.player_index] += unit.max_stability
+
+    def shield(self):
+        """
+        Shields add to the stability of a unit, and each of them decays separately until it is used up.
+        """
+        decay = self.simulator._shield_decay
+        shielders = self.board.shielders
+        ordinals = self.ordinals
+        for mover in self.movers:
+            unit = mover.unit
+            if mover.shields:
+                for index, shield in enumerate(mover.shields):
+                    lost = min(shield, decay)
+                    mover.shields[index] = shield - lost
+                    unit.stability -= lost
+            for ordinal in shielders[unit.x * ARENA_SIZE + unit.y]:
+                encryptor = ordinals[ordinal]
+                if encryptor.player_index == unit.player_index and encryptor.stability > 0 and encryptor not in mover.shielded_by:
+                    mover.shielded_by.add(encryptor)
+                    mover.shields.append(encryptor.damage)
+                    unit.stability += encryptor.damage
+
+    def attack(self):
+        """
+        Every unit picks its target before any damage is dealt, so units destroyed this frame still attack.
+        Units with nothing in range are skipped using the board's coverage.
+        """
+        attacks = []
+        attackers = self.board.attackers
+        ordinals = self.ordinals
+        in_range = set()
+        for mover in self.movers:
+            unit = mover.unit
+            in_range.update(attackers[unit.x * ARENA_SIZE + unit.y])
+        for ordinal in sorted(in_range):
+            destructor = ordinals[ordinal]
+            if destructor.stability > 0:
+                target = self.get_target(destructor)
+                if target is not None:
+                    attacks.append((destructor.player_index, target, destructor.damage))
+
+        scrambler = self.simulator._scrambler
+        for mover in self.movers:
+            unit = mover.unit
+            if not self.movers_by_player[1 - unit.player_index]:
+                if unit.unit_type == scrambler or not self.get_reach(unit)[unit.x * ARENA_SIZE + unit.y]:
+                    continue
+            target = self.get_target(unit)
+            if target is not None:
+                attacks.append((unit.player_index, target, unit.damage_f if target.stationary else unit.damage_i))
+        result = self.result
+        shielded = {id(mover.unit): mover for mover in self.movers if mover.shields} if attacks else {}
+        for player_index, target, damage in attacks:
+            result.damage_dealt[player_index] += damage
+            target.stability -= damage
+            mover = shielded.get(id(target))
+            if mover is not None:
+                # Damage uses up shields before it reaches the unit itself
+                for index, shield in enumerate(mover.shields):
+                    absorbed = min(shield, damage)
+                    mover.shields[index] = shield - absorbed
+                    damage -= absorbed
+
+        # Also removes what self destructs destroyed this frame, even when nothing attacked
+        for mover in [mover for mover in self.movers if mover.unit.stability <= 0]:
+            self.remove_mover(mover)
+            result.destroyed.append(mover.unit)
+        for firewall in [firewall for firewall in self.firewalls if firewall.stability <= 0]:
+            self.remove_firewall(firewall)
+            result.destroyed.append(firewall)
+
+    def remove_mover(self, mover):
+        unit = mover.unit
+        self.movers.remove(mover)
+        self.movers_by_player[unit.player_index] -= 1
+        self.tiles[unit.x * ARENA_SIZE + unit.y].remove(unit)
+
+    def remove_firewall(self, firewall):
+        self.firewalls.remove(firewall)
+        index = firewall.x * ARENA_SIZE + firewall.y
+        self.tiles[index].remove(firewall)
+        self.blocked[index] = 0
+        self.fields = self.field_cache.setdefault(bytes(self.blocked), {})
+        self.destroyed_firewalls.append(firewall)
+        for key, reach in self.reach.items():
+            self.remove_reach(reach, key, firewall)
+
+    def remove_reach(self, reach, key, firewall):
+        radius, player_index = key
+        if player_index != firewall.player_index:
+            for index in _get_range_footprint(firewall.x, firewall.y, radius):
+                reach[index] -= 1
+
+
+def _copy_unit(unit):
+    copied = GameUnit.__new__(GameUnit)
+    for attribute in GameUnit.__slots__:
+        setattr(copied, attribute, getattr(unit, attribute))
+    return copied
+
+
+def _target_edge(unit):
+    """
+    Information units head for the edge opposite to the one they were spawned on.
+    """
+    if unit.player_index == 0:
+        return _TOP_RIGHT if unit.x < HALF_ARENA else _TOP_LEFT
+    return _BOTTOM_RIGHT if unit.x < HALF_ARENA else _BOTTOM_LEFT
+
+
+class ActionPhaseSimulator:
+    """Simulates the action phase frame by frame
+
+    Follows the engine's order of events: units are spawned on frame 0, then every frame
+    information units move, encryptors shield, every unit attacks its target at once,
+    and destroyed units are removed. Units path like ShortestPathFinder, rerouting when a firewall
+    is destroyed, and pick targets like AdvancedGameState.get_target. Units on their target edge
+    breach on their next move, and units that cannot move any further self destruct.
+
+    The model was checked against the events in recorded replays, but it is an estimate:
+    it ignores melee, resources, and the order of units with identical stats.
+
+    Attributes:
+        * config (JSON): Contains information about the game
+        * max_frames (int): Simulations stop after this many frames
+
+    """
+    def __init__(self, config, max_frames=1000):
+        """Reads the unit and mechanics information the simulation needs from the config
+
+        Args:
+            * config (JSON): Contains information about the game
+            * max_frames: Simulations stop after this many frames
+
+        """
+        self.config = config
+        self.max_frames = max_frames
+        self._finder = FastShortestPathFinder()
+        unit_information = config["unitInformation"]
+        self._encryptor = unit_information[1]["shorthand"]
+        self._destructor = unit_information[2]["shorthand"]
+        self._scrambler = unit_information[5]["shorthand"]
+        self._player_damage = {info["shorthand"]: info.get("damageToPlayer", 0) for info in unit_information}
+        mechanics = config["mechanics"]
+        self._shield_decay = mechanics["shieldDecayPerFrame"]
+        self._self_destruct_steps = mechanics["stepsRequiredSelfDestruct"]
+        self._self_destruct_radius = mechanics["selfDestructRadius"]
+        self._end_indices = [[x * ARENA_SIZE + y for x, y in edge] for edge in EDGE_LOCATIONS]
+        self._directions = [self._finder._get_direction_from_endpoints(edge) for edge in EDGE_LOCATIONS]
+
+    def simulate(self, game_state, enemy_deploys=(), enemy_builds=()):
+        """Simulates the action phase following the turn planned in game_state
+
+        Your builds and deploys are the units already added to game_state by attempt_spawn,
+        so plan your turn with attempt_spawn first. game_state is not modified.
+
+        Args:
+            * game_state: The current game state, with your turn planned
+            * enemy_deploys: (unit_type, x, y) tuples of information units the enemy deploys, like GameState._deploy_stack
+            * enemy_builds: (unit_type, x, y) tuples of firewalls the enemy builds, like GameState._build_stack
+
+        Returns:
+            A SimulationResult
+
+        """
+        state, board = self._prepare_board(game_state, enemy_deploys, enemy_builds)
+        simulation = _Simulation(self, board, [], {})
+        result = simulation.run(self.max_frames)
+        result.game_state = state
+        for x, y in state.game_map:
+            state.game_map[x, y] = simulation.tiles[x * ARENA_SIZE + y]
+        return result
+
+    def simulate_many(self, game_state, deploy_plans, enemy_deploys=(), enemy_builds=(), deadline=None):
+        """Simulates several candidate deploys against the same board, one plan after another
+
+        Each plan's action phase is played out on its own, in order, exactly as simulate would play it.
+        What makes this faster than calling simulate for each plan is the work done once for all of them:
+        the board, with the enemy's turn added, is read once, what its firewalls cover is worked out once,
+        and pathing is shared between plans, so it is only computed once for each layout of firewalls that comes up.
+        Plans that build firewalls reuse the board too, adding only what their own firewalls cover.
+
+        Args:
+            * game_state: The current game state, with your builds planned
+            * deploy_plans: A list of plans, each a list of (unit_type, x, y) tuples of units you deploy, like GameState._deploy_stack
+            * enemy_deploys: (unit_type, x, y) tuples of information units the enemy deploys, like GameState._deploy_stack
+            * enemy_builds: (unit_type, x, y) tuples of firewalls the enemy builds, like GameState._build_stack
+            * deadline: A time.monotonic() value. Plans that are not started by then are skipped
+
+        Returns:
+            A SimulationResult for each plan, in the same order, or None for skipped plans. Their game_state is None.
+
+        """
+        state, board = self._prepare_board(game_state, enemy_deploys, enemy_builds)
+        field_cache = {}
+        results = []
+        for plan in deploy_plans:
+            if deadline is not None and time.monotonic() >= deadline:
+                results.append(None)
+                continue
+            deployed = [GameUnit(unit_type, self.config, 0, None, x, y) for unit_type, x, y in plan]
+            if any(unit.stationary for unit in deployed):
+                # Firewalls in the plan change what the board covers
+                simulation = _Simulation(self, _Board(deployed, self._encryptor, self._destructor, board), [], field_cache)
+            else:
+                simulation = _Simulation(self, board, deployed, field_cache)
+            results.append(simulation.run(self.max_frames))
+        return results
+
+    @staticmethod
+    def enumerate_plans(unit_types, locations, counts):
+        """Builds a deploy plan for every combination of unit type, spawn location and count
+
+        Args:
+            * unit_types: The information unit types to try
+            * locations: The spawn locations to try
+            * counts: The numbers of units to try
+
+        Returns:
+            A list of plans that can be passed to simulate_many
+
+        """
+        return [[(unit_type, location[0], location[1])] * count
+                for unit_type, location, count in itertools.product(unit_types, locations, counts)]
+
+    def _prepare_board(self, game_state, enemy_deploys, enemy_builds):
+        """
+        Gets a copy of game_state with the enemy's turn added, and the _Board of its units.
+        """
+        state = self._prepare_state(game_state)
+        game_map = state.game_map
+        for unit_type, x, y in list(enemy_builds) + list(enemy_deploys):
+            game_map.add_unit(unit_type, [x, y], 1)
+        units = []
+        for x, y in game_map:
+            units.extend(game_map[x, y])
+        return state, _Board(units, self._encryptor, self._destructor)
+
+    def _prepare_state(self, game_state):
+        """
+        Gets an AdvancedGameState copy of game_state, so the result can be inspected with AdvancedGameState's functions.
+        """
+        if isinstance(game_state, AdvancedGameState):
+            return game_state.clone()
+        state = AdvancedGameState.__new__(AdvancedGameState)
+        state.__dict__.update(game_state.clone().__dict__)
+        state._coverage_maps = {}
+        return state
@@ -1,8 +1,36 @@
 import unittest
+import contextlib
+import io
 import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
 from .game_state import GameState
-from .unit import GameUnit
+from .unit import GameUnit, get_type_stats
+from .util import decode_json, peek_turn_info
 from .advanced_game_state import AdvancedGameState
+from .navigation import ShortestPathFinder, FastShortestPathFinder, IncrementalPathField
+from .simulator import ActionPhaseSimulator, _Board, _Simulation
+from .rollout import RolloutPool
+from .algocore import AlgoCore
+from .replay import ReplayReader
+from .replay_store import ReplayStore
+from .engine import LocalEngine
+from .transport import StreamTransport, SocketTransport
+from .util import set_transport
+
+@contextlib.contextmanager
+def mock_stdin(text):
+    stdin = sys.stdin
+    sys.stdin = io.StringIO(text)
+    try:
+        yield
+    finally:
+        sys.stdin = stdin
+
 
 class BasicTests(unittest.TestCase):
 
@@ -240,3 +268,704 @@ class BasicTests(unittest.TestCase):
         actual = game.project_future_bits(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} power {} turns from now, got {}".format(expected, turns, actual))
 
+    def test_fast_path_finder_matches(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game_map = game.game_map
+        rng = random.Random(1234)
+        all_locations = list(game_map)
+        reference = ShortestPathFinder()
+        fast = FastShortestPathFinder()
+        for _ in range(3):
+            for location in rng.sample(all_locations, 120):
+                if location[1] < 14:
+                    game_map.add_unit("FF", location, 0)
+                else:
+                    game_map.add_unit("FF", location, 1)
+            for edge in range(4):
+                end_points = game_map.get_edge_locations(edge)
+                for start in rng.sample(all_locations, 15):
+                    expected = reference.navigate_multiple_endpoints(start, end_points, game)
+                    actual = fast.navigate_multiple_endpoints(start, end_points, game)
+                    self.assertEqual(expected, actual, "Paths differ from {} to edge {}".format(start, edge))
+
+    def test_path_cache(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        edge = game.game_map.TOP_RIGHT
+        first = game.find_path_to_edge([13, 0], edge)
+        layout = game.game_map.get_blocked_tiles()
+        self.assertIs(layout, game.game_map.get_blocked_tiles(), "Layout should be cached while the map is unchanged")
+        first.append([0, 0])
+        self.assertEqual(first[:-1], game.find_path_to_edge([13, 0], edge), "Cached paths should not be shared with callers")
+
+        game.attempt_spawn("FF", [14, 1])
+        self.assertIsNot(layout, game.game_map.get_blocked_tiles(), "Spawning a firewall should change the layout")
+        expected = ShortestPathFinder().navigate_multiple_endpoints([13, 0], game.game_map.get_edge_locations(edge), game)
+        self.assertEqual(expected, game.find_path_to_edge([13, 0], edge), "Path was not recomputed after spawning")
+
+        game.game_map.remove_unit([14, 1])
+        self.assertEqual(first[:-1], game.find_path_to_edge([13, 0], edge), "Path was not recomputed after removing")
+
+        # Tiles edited in place, as the original state parsing did
+        revision = game.game_map.revision
+        game.game_map[13, 1].append(GameUnit("FF", game.config, 0, None, 13, 1))
+        self.assertNotIn([13, 1], game.find_path_to_edge([13, 0], edge), "Units appended to a tile should block paths")
+        self.assertNotEqual(revision, game.game_map.revision, "Appending to a tile should change the revision")
+        game.game_map[13, 1].pop()
+        self.assertEqual(first[:-1], game.find_path_to_edge([13, 0], edge), "Units popped from a tile should stop blocking paths")
+
+        game.PATH_CACHE_SIZE = 2
+        for start in ([13, 0], [12, 1], [11, 2]):
+            game.find_path_to_edge(start, edge)
+        self.assertEqual(2, len(game._path_cache), "Least recently used paths should be evicted")
+
+    def test_find_paths_to_edge(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        rng = random.Random(99)
+        for location in rng.sample(list(game.game_map), 150):
+            game.game_map.add_unit("FF", location, 0)
+        for edge in range(4):
+            starts = rng.sample(list(game.game_map), 60)
+            paths = game.find_paths_to_edge(edge, starts)
+            self.assertEqual(len(starts), len(paths))
+            reference = ShortestPathFinder()
+            end_points = game.game_map.get_edge_locations(edge)
+            for start, path in zip(starts, paths):
+                if game.contains_stationary_unit(start):
+                    self.assertIsNone(path, "Blocked locations should not have a path")
+                else:
+                    self.assertEqual(reference.navigate_multiple_endpoints(start, end_points, game), path,
+                                     "Batch path differs from {} to edge {}".format(start, edge))
+
+        friendly_edges = game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT) + game.game_map.get_edge_locations(game.game_map.BOTTOM_RIGHT)
+        self.assertEqual(len(friendly_edges), len(game.find_paths_to_edge(game.game_map.TOP_RIGHT)), "Should default to our edges")
+
+    def test_incremental_path_field(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        rng = random.Random(7)
+        all_locations = list(game.game_map)
+        for location in rng.sample(all_locations, 100):
+            game.game_map.add_unit("FF", location, 0)
+        end_points = game.game_map.get_edge_locations(game.game_map.TOP_LEFT)
+        field = IncrementalPathField(game, end_points)
+        initial = list(field._pathlength)
+        finder = FastShortestPathFinder()
+
+        for _ in range(40):
+            location = rng.choice(all_locations)
+            if rng.random() < 0.6:
+                field.block(location)
+                game.game_map.add_unit("FF", location, 0)
+            else:
+                field.unblock(location)
+                game.game_map.remove_unit(location)
+            for start in rng.sample(all_locations, 5):
+                self.assertEqual(finder.navigate_multiple_endpoints(start, end_points, game), field.get_path(start),
+                                 "Incremental path differs from {}".format(start))
+
+        while field.rollback():
+            pass
+        self.assertEqual(initial, field._pathlength, "Rolling back every edit should restore the original field")
+
+    def test_arena_geometry(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game_map = game.game_map
+        self.assertEqual(420, len(list(game_map)), "The arena should have 420 tiles")
+        self.assertEqual(420, sum(game_map.in_arena_bounds([x, y]) for x in range(-1, 29) for y in range(-1, 29)))
+        self.assertTrue(game_map.in_arena_bounds([13.0, 0.0]), "Float locations should still be checked")
+        self.assertFalse(game_map.in_arena_bounds([12, 0]), "[12, 0] is outside the diamond")
+        for edge in game_map.get_edges():
+            self.assertEqual(14, len(edge), "Every edge has 14 tiles")
+            for location in edge:
+                self.assertTrue(game_map.in_arena_bounds(location))
+        game_map.get_edge_locations(game_map.BOTTOM_LEFT).append([0, 0])
+        self.assertEqual(14, len(game_map.get_edge_locations(game_map.BOTTOM_LEFT)), "Edge lists should not be shared")
+        self.assertTrue(game.can_spawn("PI", (0, 13)), "Tuple locations on our edge should be valid spawns")
+        self.assertFalse(game.can_spawn("PI", [1, 13]), "Information units must spawn on an edge")
+
+    def test_range_coverage(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game_map = game.game_map
+        self.assertEqual([[13, 13]], game_map.get_locations_in_range([13, 13], 0))
+        self.assertEqual(game_map.get_locations_in_range([13, 0], 3), game_map.get_locations_in_range([13.0, 0.0], 3),
+                         "Float and integer centers should cover the same locations")
+        for radius in [0.5, 1.5, 2.5, 4.5]:
+            for x, y in game_map:
+                self.assertEqual(game_map.get_locations_in_range([float(x), float(y)], radius), game_map.get_locations_in_range([x, y], radius),
+                                 "Fractional radii should find the locations they always have")
+        centers = [[13, 13], [13, 13], [3, 10], [0, 13]]
+        coverage = game_map.get_range_coverage(centers, 3)
+        expected = [[0] * game_map.ARENA_SIZE for _ in range(game_map.ARENA_SIZE)]
+        for center in centers:
+            for x, y in game_map.get_locations_in_range(center, 3):
+                expected[x][y] += 1
+        self.assertEqual(expected, coverage, "Coverage should count every center in range")
+        self.assertEqual(2, coverage[13][13], "Stacked centers should both be counted")
+
+    def test_advanced_threat_map(self):
+        game = self.make_turn_0_map(True)
+        self.assertEqual(0, game.threat_map(0)[13][13], "No destructors, no threat")
+        game.game_map.add_unit("DF", [12, 14], 1)
+        game.game_map.add_unit("DF", [13, 14], 1)
+        game.game_map.add_unit("DF", [12, 12], 0)
+        threat = game.threat_map(0)
+        for x, y in game.game_map:
+            self.assertEqual(4.0 * len(game.get_attackers([x, y], 0)), threat[x][y], "Threat differs at {}".format([x, y]))
+        self.assertIs(threat, game.threat_map(0), "Threat map should be cached while the map is unchanged")
+        game.game_map.remove_unit([13, 14])
+        visited = 0
+        for location in game.game_map:
+            game.threat_map(0)
+            visited += 1
+        self.assertEqual(420, visited, "Building the threat map should not cut short a loop over the map")
+        self.assertEqual(4.0, game.threat_map(0)[13][13], "Threat map should be rebuilt after the map changes")
+        path = game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)
+        self.assertEqual(sum(4.0 * len(game.get_attackers(location, 0)) for location in path), game.get_path_damage(path, 0))
+
+    def test_advanced_shield_map(self):
+        game = self.make_turn_0_map(True)
+        game.game_map.add_unit("EF", [13, 3], 0)
+        game.game_map.add_unit("EF", [14, 3], 0)
+        game.game_map.add_unit("EF", [13, 20], 1)
+        shield = game.shield_map(0)
+        self.assertEqual(20.0, shield[13][2], "Both encryptors should cover [13, 2]")
+        self.assertEqual(0, shield[13][20], "Enemy encryptors should not shield us")
+        self.assertIs(shield, game.shield_map(0), "Shield map should be cached while the map is unchanged")
+
+        path = game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)
+        self.assertEqual(20.0, game.get_path_shielding(path, 0), "Each encryptor should shield a unit once")
+        decayed = game.get_path_shielding(path, 0, "PI")
+        self.assertTrue(0 <= decayed < 20.0, "Shields should decay before the unit reaches the edge")
+        with self.assertWarns(UserWarning):
+            self.assertEqual(0, game.get_path_shielding(path, 0, "FF"), "Firewalls do not move, so they collect no shield")
+        game.game_map.remove_unit([14, 3])
+        self.assertEqual(10.0, game.get_path_shielding(path, 0), "Shield sources should be rebuilt after the map changes")
+
+    def test_parse_decoded_state(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        state = """{"p2Units":[[[13,27,60.0,"2"]],[],[[14,16,75.0,"4"]],[],[],[],[]],"turnInfo":[0,3,-1],"p1Stats":[28.0,12.0,7.5,120],"p1Units":[[[13,0,60.0,"1"]],[],[],[],[],[],[]],"p2Stats":[30.0,3.0,1.0,95],"events":{}}"""
+        self.assertIs(decode_json(state), decode_json(state), "The last decoded line should be remembered")
+        from_string = type(game)(game.config, state)
+        from_dict = type(game)(game.config, json.loads(state))
+        for parsed in (from_string, from_dict):
+            self.assertEqual(3, parsed.turn_number)
+            self.assertEqual(7.5, parsed.get_resource(parsed.BITS))
+            self.assertEqual(1, parsed.get_resource(parsed.BITS, 1))
+            self.assertEqual(75.0, parsed.game_map[14, 16][0].stability)
+            self.assertEqual(1, parsed.game_map[13, 27][0].player_index)
+            self.assertTrue(parsed.contains_stationary_unit([13, 0]))
+
+    def test_unit_stats(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("DF", [13, 5], 0)
+        game.game_map.add_unit("PI", [13, 0], 0)
+        game.game_map.add_unit("PI", [13, 0], 0)
+        destructor = game.game_map[13, 5][0]
+        first_ping, second_ping = game.game_map[13, 0]
+        self.assertIs(first_ping.stats, second_ping.stats, "Units of the same type should share their stats")
+        self.assertFalse(hasattr(first_ping, "__dict__"), "Units should not have a per instance dictionary")
+        self.assertEqual((True, 0, 4.0, 3.0, 75.0, 3), (destructor.stationary, destructor.speed, destructor.damage,
+                         destructor.range, destructor.max_stability, destructor.cost))
+        self.assertEqual((False, 0.5, 1.0, 1.0, 15.0), (first_ping.stationary, first_ping.speed, first_ping.damage_f,
+                         first_ping.damage_i, first_ping.stability))
+        self.assertIs(game.config, first_ping.config)
+
+        other_config = json.loads(json.dumps(game.config))
+        other_config["unitInformation"][3]["stability"] = 20.0
+        self.assertEqual(20.0, get_type_stats(other_config)["PI"].max_stability)
+        self.assertEqual(15.0, get_type_stats(game.config)["PI"].max_stability, "Stats should follow the config they are asked for")
+        self.assertIs(get_type_stats(other_config), get_type_stats(other_config), "Stats of both configs should stay cached")
+
+        first_ping.damage_f = 5.0
+        self.assertEqual((5.0, 1.0), (first_ping.damage_f, second_ping.damage_f), "Setting a stat should only change that unit")
+
+        state = """{"p2Units":[[],[],[],[],[],[],[]],"turnInfo":[0,4,-1],"p1Stats":[30.0,5.0,5.0,0],"p1Units":[[[13,2,60.0,"1"]],[],[],[],[],[],[[13,2,60.0,"1"]]],"p2Stats":[30.0,5.0,5.0,0],"events":{}}"""
+        parsed = type(game)(game.config, state)
+        self.assertEqual(1, len(parsed.game_map[13, 2]), "Removal markers should not become units")
+        self.assertTrue(parsed.game_map[13, 2][0].pending_removal)
+
+    def test_clone(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.attempt_spawn("FF", [13, 5])
+        game.game_map.add_unit("PI", [13, 0], 0)
+        clone = game.clone()
+        self.assertIsInstance(clone, type(game))
+        self.assertIs(game.config, clone.config, "Clones should share the config")
+        self.assertIs(game.game_map[13, 5], clone.game_map[13, 5], "Unchanged tiles should be shared")
+
+        clone.attempt_spawn("DF", [12, 5])
+        clone.game_map.add_unit("PI", [13, 0], 0)
+        clone.game_map.remove_unit([13, 5])
+        self.assertEqual(1, len(game.game_map[13, 5]), "Removing from a clone should not change the original")
+        self.assertEqual(0, len(game.game_map[12, 5]), "Spawning on a clone should not change the original")
+        self.assertEqual(1, len(game.game_map[13, 0]), "Stacking on a clone should not change the original")
+        self.assertEqual([("FF", 13, 5)], game._build_stack)
+        self.assertEqual(24, game.get_resource(game.CORES))
+        self.assertEqual(21, clone.get_resource(clone.CORES))
+
+        game.game_map.add_unit("FF", [10, 5], 0)
+        self.assertEqual(0, len(clone.game_map[10, 5]), "Changing the original should not change a clone")
+
+        checkpoint = clone.checkpoint()
+        layout = clone.game_map.get_blocked_tiles()
+        clone.attempt_spawn("FF", [11, 5])
+        clone.attempt_spawn("PI", [13, 0])
+        clone.game_map.remove_unit([12, 5])
+        clone.undo(checkpoint)
+        self.assertEqual(layout, clone.game_map.get_blocked_tiles(), "Undo should restore the map")
+        self.assertEqual(2, len(clone.game_map[13, 0]))
+        self.assertEqual([("FF", 13, 5), ("DF", 12, 5)], clone._build_stack, "Undo should restore the build stack")
+        self.assertEqual([], clone._deploy_stack, "Undo should restore the deploy stack")
+        self.assertEqual(21, clone.get_resource(clone.CORES), "Undo should restore resources")
+        self.assertEqual(5, clone.get_resource(clone.BITS), "Undo should restore resources")
+
+        game_map = clone.game_map
+        game_map.add_unit("FF", [9, 10], 0)
+        self.assertIsNone(game_map._GameMap__undo_log, "Changes should not be recorded without an open checkpoint")
+        outer = game_map.checkpoint()
+        game_map.add_unit("FF", [8, 10], 0)
+        inner = game_map.checkpoint()
+        game_map.add_unit("FF", [7, 10], 0)
+        game_map.undo(inner)
+        self.assertEqual((0, 1), (len(game_map[7, 10]), len(game_map[8, 10])), "Undo should only revert to its checkpoint")
+        game_map.add_unit("FF", [6, 10], 0)
+        game_map.undo(outer)
+        self.assertEqual((0, 0, 1), (len(game_map[6, 10]), len(game_map[8, 10]), len(game_map[9, 10])))
+        self.assertIsNone(game_map._GameMap__undo_log, "Undoing the outermost checkpoint should drop the undo log")
+
+    def test_simulator(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.attempt_spawn("PI", [13, 0], 3)
+        simulator = ActionPhaseSimulator(game.config)
+
+        result = simulator.simulate(game)
+        self.assertEqual(3, len(result.breaches), "Undefended pings should all breach")
+        self.assertEqual([0, 3], result.damage_to_player)
+        self.assertEqual([], result.destroyed)
+        self.assertEqual(3, len(game.game_map[13, 0]), "Simulating should not change the game state")
+        self.assertEqual(15, game.game_map[13, 0][0].stability, "Simulating should not damage the game state's units")
+
+        defenses = [("DF", 23, 14), ("DF", 24, 14), ("DF", 25, 14)]
+        result = simulator.simulate(game, enemy_builds=defenses)
+        self.assertEqual(0, len(result.breaches), "The destructors should stop every ping")
+        self.assertEqual(3, len(result.destroyed))
+        self.assertTrue(all(unit.unit_type == "PI" for unit in result.destroyed), "Pings can not destroy destructors this fast")
+        unshielded = result
+
+        game.attempt_spawn("EF", [[12, 1], [14, 1]])
+        result = simulator.simulate(game, enemy_builds=defenses)
+        self.assertEqual(3, len(result.destroyed))
+        self.assertGreater(result.damage_dealt[1], unshielded.damage_dealt[1], "Shields should absorb some of the damage")
+
+        result = simulator.simulate(game, enemy_deploys=[("SI", 14, 27)])
+        self.assertEqual([0, 0, 0, 1], sorted(player_index for location, player_index, unit_type in result.breaches))
+        self.assertEqual([1, 3], result.damage_to_player)
+
+        # A wall on row 6 traps the ping, and its self destruct finishes off a damaged enemy filter in the wall
+        game = self.make_turn_0_map(adv)
+        for x in range(7, 20):
+            game.game_map.add_unit("FF", [x, 6], 0)
+        game.game_map.add_unit("FF", [20, 6], 1)
+        game.game_map[20, 6][0].stability = 10
+        game.attempt_spawn("PI", [13, 0])
+        result = simulator.simulate(game)
+        self.assertEqual([([19, 5], 0, "PI")], result.self_destructs)
+        self.assertEqual([("FF", 20, 6)], [(unit.unit_type, unit.x, unit.y) for unit in result.destroyed])
+        self.assertEqual([], result.game_state.game_map[20, 6], "Firewalls destroyed by a self destruct should be removed")
+
+    def test_advanced_simulator_targets(self):
+        game = self.make_turn_0_map(True)
+        simulator = ActionPhaseSimulator(game.config)
+        # A generator of its own, so other tests' use of random is left alone
+        rng = random.Random(3)
+        locations = [location for location in game.game_map]
+        for location in rng.sample(locations, 80):
+            game.game_map.add_unit(rng.choice(["FF", "EF", "DF", "PI", "EI", "SI"]), location, rng.randint(0, 1))
+        simulation = _Simulation(simulator, _Board([], "EF", "DF"), [], {})
+        for x, y in locations:
+            simulation.tiles[x * game.ARENA_SIZE + y] = game.game_map[x, y]
+        for x, y in locations:
+            for unit in game.game_map[x, y]:
+                if unit.unit_type in ("FF", "EF"):
+                    continue
+                expected = game.get_target(unit)
+                if unit.unit_type == "DF" and expected is not None and expected.stationary:
+                    expected = None
+                self.assertIs(expected, simulation.get_target(unit), "The simulator should target like get_target")
+
+    def test_simulate_many(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.attempt_spawn("EF", [[12, 1], [14, 1]])
+        simulator = ActionPhaseSimulator(game.config)
+        defenses = [("DF", 23, 14), ("DF", 24, 14), ("DF", 25, 14), ("FF", 4, 14)]
+        plans = simulator.enumerate_plans(["PI", "SI"], [[13, 0], [3, 10]], [1, 3])
+        self.assertEqual(8, len(plans))
+        self.assertEqual([("SI", 3, 10)] * 3, plans[-1])
+        plans.append([("PI", 13, 0), ("FF", 12, 2)])
+        # Plans after one that builds should not see its firewalls
+        plans.insert(0, [("SI", 13, 0), ("DF", 13, 2), ("EF", 11, 2)])
+
+        results = simulator.simulate_many(game, plans, enemy_builds=defenses)
+        self.assertEqual(len(plans), len(results))
+        for plan, result in zip(plans, results):
+            planned = game.clone()
+            for unit_type, x, y in plan:
+                planned.game_map.add_unit(unit_type, [x, y], 0)
+            expected = simulator.simulate(planned, enemy_builds=defenses)
+            self.assertEqual(str(expected), str(result), "Simulating plans together should match simulating them one at a time")
+            self.assertEqual(expected.damage_dealt, result.damage_dealt)
+            self.assertIsNone(result.game_state)
+
+    def test_rollout_pool(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        simulator = ActionPhaseSimulator(game.config)
+        plans = []
+        for location in [[13, 0], [3, 10], [20, 6]]:
+            plan = game.clone()
+            plan.attempt_spawn("EF", [12, 1])
+            plan.attempt_spawn("PI", location, 2)
+            plans.append(plan)
+        plans.append(([("FF", 13, 2)], [("EI", 13, 0)]))
+
+        with RolloutPool(game.config, processes=2) as pool:
+            summaries = pool.evaluate(game, plans, 30, enemy_builds=[("DF", 23, 14)])
+            for plan, summary in zip(plans, summaries):
+                if isinstance(plan, GameState):
+                    expected = simulator.simulate(plan, enemy_builds=[("DF", 23, 14)])
+                    self.assertEqual(expected.damage_to_player, summary.damage_to_player)
+                    self.assertEqual(len(expected.destroyed), len(summary.destroyed))
+                    self.assertEqual(expected.frames, summary.frames)
+            self.assertEqual([("EI", 23, 11, 0)], summaries[3].destroyed, "The destructor should stop the EMP")
+            self.assertEqual([None] * 4, pool.evaluate(game, plans, 0), "Nothing finishes before a deadline that has passed")
+
+            # A new turn's state replaces the shared one
+            walled = type(game)(game.config, game.serialized_string.replace('"p1Units":[[]', '"p1Units":[[[13,1,60.0,"9"]]'))
+            plan = walled.clone()
+            plan.attempt_spawn("PI", [13, 0])
+            summary = pool.evaluate(walled, [plan], 30)[0]
+            self.assertEqual(simulator.simulate(plan).frames, summary.frames, "Workers should simulate the new state")
+            self.assertNotEqual(summaries[0].frames, summary.frames)
+
+    def test_turn_budget(self, adv=False):
+        game = self.make_turn_0_map(adv)
+
+        class AnytimeAlgo(AlgoCore):
+            def __init__(self, step_time):
+                super().__init__()
+                self.step_time = step_time
+
+            def on_turn(self, turn_state):
+                game_state = type(game)(self.config, turn_state)
+                self.submit_anytime(game_state, self.plans(game_state))
+
+            def plans(self, game_state):
+                for x in [13, 12, 11]:
+                    plan = game_state.clone()
+                    plan.attempt_spawn("FF", [x, 4])
+                    yield plan
+                    time.sleep(self.step_time)
+
+        def play(algo, config=game.config, errors=None):
+            lines = [json.dumps(config), game.serialized_string,
+                     '{"turnInfo":[2,0,0],"p1Stats":[30,25,5,0],"p2Stats":[30,25,5,0],"p1Units":[],"p2Units":[]}']
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output), contextlib.redirect_stderr(errors or io.StringIO()), mock_stdin("\n".join(lines) + "\n"):
+                algo.start()
+            return output.getvalue().splitlines()
+
+        algo = AnytimeAlgo(0)
+        self.assertEqual(['[["FF", 11, 4]]', "[]"], play(algo), "The last plan should be submitted")
+        self.assertEqual(70, algo.turn_time_limit, "The time limit should be read from the config")
+        timing = algo.turn_timings[0]
+        self.assertEqual((0, 3, False), (timing.turn_number, timing.steps, timing.forced))
+
+        algo = AnytimeAlgo(0.2)
+        algo.turn_time_limit = 0.3
+        algo.turn_safety_margin = 0.1
+        self.assertEqual(['[["FF", 13, 4]]', "[]"], play(algo), "The watchdog should submit the first plan")
+        timing = algo.turn_timings[0]
+        self.assertTrue(timing.forced)
+        self.assertLess(timing.submitted - timing.started, 0.3, "The turn should be submitted by the deadline")
+
+        config = dict(game.config, timingAndReplay={"replaySave": 0})
+        algo = AnytimeAlgo(0.05)
+        errors = io.StringIO()
+        self.assertEqual(['[["FF", 11, 4]]', "[]"], play(algo, config, errors), "Without a time limit every plan should be made")
+        self.assertIsNone(algo.turn_time_limit)
+        self.assertNotIn("Error", errors.getvalue(), "No watchdog should be started without a time limit")
+
+    def test_action_frames(self, adv=False):
+        game = self.make_turn_0_map(adv)
+
+        def frame(number, events):
+            all_events = {"selfDestruct": [], "breach": [], "damage": [], "shield": [], "move": [], "spawn": [], "death": [], "attack": [], "melee": []}
+            all_events.update(events)
+            return json.dumps({"p2Units": [[], [], [], [], [], [], []], "turnInfo": [1, 0, number], "p1Stats": [30, 25, 5, 0],
+                               "p1Units": [[], [], [], [], [], [], []], "p2Stats": [30, 25, 5, 0], "events": all_events})
+
+        lines = [json.dumps(game.config), game.serialized_string,
+                 frame(0, {"spawn": [[[13, 0], 3, "1", 1], [[14, 27], 5, "2", 2], [[4, 14], 0, "3", 2]]}),
+                 frame(1, {"attack": [[[13, 1], [14, 2], 1.0, 3, "1", "2", 1]],
+                           "death": [[[14, 2], 5, "2", 2, False], [[4, 14], 0, "3", 2, True], [[27, 14], 3, "1", 1, False]],
+                           "breach": [[[27, 14], 1.0, 3, "1", 1]]}),
+                 game.serialized_string.replace('"turnInfo":[0,0,-1]', '"turnInfo":[0,1,-1]'),
+                 '{"turnInfo":[2,1,0],"p1Stats":[30,25,5,0],"p2Stats":[30,25,5,0],"p1Units":[],"p2Units":[]}']
+
+        class FrameAlgo(AlgoCore):
+            def __init__(self):
+                super().__init__()
+                self.frames = []
+                self.summaries = []
+
+            def on_turn(self, turn_state):
+                self.summaries.append(self.action_phase_summary)
+                self.submit_default_turn()
+
+            def on_action_frame(self, frame):
+                self.frames.append((frame.turn_number, frame.frame_number, len(frame.get_events("attack"))))
+
+        def play(algo):
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()), mock_stdin("\n".join(lines) + "\n"):
+                algo.start()
+
+        algo = FrameAlgo()
+        play(algo)
+        self.assertEqual([(0, 0, 0), (0, 1, 1)], algo.frames)
+        self.assertEqual([None, None], algo.summaries, "Summaries should only be gathered when asked for")
+
+        algo = FrameAlgo()
+        algo.summarize_action_phase = True
+        play(algo)
+        summary = algo.summaries[1]
+        self.assertEqual((0, 2), (summary.turn_number, summary.frames))
+        self.assertEqual([([27, 14], 0, "PI")], summary.breaches)
+        self.assertEqual([([14, 2], 1, "SI")], summary.destroyed, "Removed and breaching units were not destroyed")
+        self.assertEqual([("SI", 14, 27), ("FF", 4, 14)], summary.enemy_spawns)
+
+    def test_precompute(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        next_turn = game.serialized_string.replace('"turnInfo":[0,0,-1]', '"turnInfo":[0,1,-1]')
+        lines = [json.dumps(game.config), game.serialized_string, next_turn,
+                 '{"turnInfo":[2,1,0],"p1Stats":[30,25,5,0],"p2Stats":[30,25,5,0],"p1Units":[],"p2Units":[]}']
+
+        class PrecomputeAlgo(AlgoCore):
+            def __init__(self, work_time):
+                super().__init__()
+                self.work_time = work_time
+                self.received = []
+                self.cancelled = []
+
+            def on_turn(self, turn_state):
+                self.received.append(self.precomputed)
+                self.submit_default_turn()
+
+            def precompute(self, turn_state):
+                game_state = type(game)(self.config, turn_state)
+                end = time.monotonic() + self.work_time
+                while time.monotonic() < end:
+                    if self.precompute_cancelled():
+                        self.cancelled.append(game_state.turn_number)
+                        return None
+                    time.sleep(0.01)
+                return game_state.find_path_to_edge([13, 0], game_state.game_map.TOP_RIGHT)
+
+        def play(algo):
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()), mock_stdin("\n".join(lines) + "\n"):
+                algo.start()
+
+        algo = PrecomputeAlgo(0)
+        algo.precompute_wait = 5
+        play(algo)
+        self.assertEqual([None, game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)], algo.received, "The next turn should get what was precomputed")
+
+        algo = PrecomputeAlgo(5)
+        algo.precompute_wait = 0.05
+        play(algo)
+        self.assertEqual([None, None], algo.received, "Precompute should not hold up the next turn")
+        for _ in range(100):
+            if algo.cancelled:
+                break
+            time.sleep(0.01)
+        self.assertEqual([0], algo.cancelled, "Late precompute should be cancelled")
+
+    def write_replay(self, game, directory):
+        no_events = {"selfDestruct": [], "breach": [], "damage": [], "shield": [], "move": [], "spawn": [], "death": [], "attack": [], "melee": []}
+        breach = dict(no_events, breach=[[[27, 14], 1.0, 3, "1", 1]], move=[[[26, 13], [27, 14], [0, 0], 3, "1", 1]])
+        spawn = dict(no_events, spawn=[[[13, 0], 3, "1", 1]])
+        filters = [[[13, 0, 60.0, "5"]], [], [], [], [], [], []]
+        frames = [json.dumps({"p2Units": [[], [], [], [], [], [], []], "turnInfo": turn_info, "p1Stats": [30.0, 25.0, 5.0, 0],
+                              "p1Units": units, "p2Stats": [30.0 - index, 25.0, 5.0, 0], "events": events})
+                  for index, (turn_info, units, events) in enumerate([([1, 0, 0], [[]] * 7, spawn), ([1, 0, 1], [[]] * 7, breach),
+                                                                      ([0, 1, -1], filters, no_events)])]
+        end = '{"p2Units":[],"turnInfo":[2,1,0],"endStats":{"winner":1,"turns":1},"p1Units":[],"events":{"breach":[]}}'
+        lines = [json.dumps(game.config), game.serialized_string] + frames + [end]
+        path = os.path.join(directory, "game.replay")
+        with open(path, "w") as replay:
+            replay.write("\n\n".join(lines) + "\n")
+        return path
+
+    def test_replay_reader(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_replay(game, directory)
+            with ReplayReader(path) as reader:
+                self.assertEqual(game.config, reader.config)
+                self.assertEqual(5, len(reader))
+                self.assertEqual([0, 1], reader.turn_numbers())
+                action_frames = list(reader.frames(state_type=1))
+                self.assertEqual([0, 1], [frame.frame_number for frame in action_frames])
+                self.assertEqual([[], [[[27, 14], 1.0, 3, "1", 1]]], [frame.get_events("breach") for frame in action_frames])
+                self.assertEqual([29.0, 25.0, 5.0, 0], action_frames[1].get_value("p2Stats"))
+                self.assertIsNone(action_frames[1].get_value("endStats"))
+                turn = list(reader.frames(state_type=0, turn_number=1))
+                self.assertEqual([(0, 1)], [(frame.state_type, frame.turn_number) for frame in turn])
+                self.assertEqual({"winner": 1, "turns": 1}, reader.end_stats())
+
+            open(path, "w").close()
+            with ReplayReader(path) as reader:
+                self.assertEqual((None, 0, None), (reader.config, len(reader), reader.end_stats()), "Empty replays should be read as empty")
+
+    def test_replay_game_state(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        with tempfile.TemporaryDirectory() as directory:
+            with ReplayReader(self.write_replay(game, directory)) as reader:
+                state = reader.get_game_state(1, type(game))
+                self.assertIsInstance(state, type(game))
+                self.assertEqual((1, 30.0, 28.0), (state.turn_number, state.my_health, state.enemy_health))
+                self.assertEqual("FF", state.game_map[13, 0][0].unit_type)
+                self.assertEqual(0, reader.get_game_state(0).turn_number)
+                with self.assertRaises(KeyError):
+                    reader.get_game_state(2)
+
+    def test_replay_store(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_replay(game, directory)
+            store_path = os.path.join(directory, "replays.store")
+            ReplayStore.convert([path, path], store_path).close()
+            with ReplayStore(store_path) as store:
+                self.assertEqual(["game.replay", "game.replay"], store.replays)
+                self.assertEqual(["FF", "EF", "DF", "PI", "EI", "SI", "RM"], store.unit_types)
+                breaches = store.get_table("breach")
+                self.assertEqual(2, len(breaches))
+                self.assertEqual([(0, 1, 27, 14, 1.0, 3, 1, 0)] * 2, breaches.select(*breaches.column_names[1:]))
+                spawns = dict(((game_index, unit_id), (x, y)) for game_index, unit_id, x, y in store.get_table("spawn").select("game", "unit_id", "x", "y"))
+                self.assertEqual([(13, 0)], [spawns[game_index, unit_id] for game_index, unit_id in breaches.select("game", "unit_id", game=1)],
+                                 "Breaches should be traced back to their spawn")
+                self.assertEqual([(1, 26, 13, 27, 14)], store.get_table("move").select("game", "x", "y", "to_x", "to_y", game=1))
+                self.assertEqual([(0, 30.0), (1, 30.0), (0, 30.0), (1, 28.0)], store.get_table("stats").select("player", "health", game=0))
+                self.assertEqual([(0, 1, 1)], store.get_table("games").select("game", "winner", "turns", game=0))
+                self.assertEqual([], store.get_table("death").select("x", "y"))
+                units = store.get_table("units")
+                self.assertEqual([(1, 0, 0, 13, 0, 60.0, 5)], units.select(*units.column_names[1:], game=1))
+
+    def test_local_engine(self, adv=False):
+        game = self.make_turn_0_map(adv)
+
+        class PingAlgo(AlgoCore):
+            def __init__(self):
+                super().__init__()
+                self.enemy_health = []
+
+            def on_turn(self, turn_state):
+                game_state = type(game)(self.config, turn_state)
+                self.enemy_health.append(game_state.enemy_health)
+                game_state.attempt_spawn("PI", [13, 0], int(game_state.get_resource(game_state.BITS)))
+                game_state.submit_turn()
+
+        class IdleAlgo(AlgoCore):
+            def __init__(self):
+                super().__init__()
+                self.health = []
+
+            def on_turn(self, turn_state):
+                game_state = type(game)(self.config, turn_state)
+                self.health.append(game_state.my_health)
+                self.submit_default_turn()
+
+        class CrashAlgo(AlgoCore):
+            def on_turn(self, turn_state):
+                raise ValueError("Crash")
+
+        engine = LocalEngine(game.config, max_turns=20, turn_time_limit=10)
+        pinger, idler = PingAlgo(), IdleAlgo()
+        result = engine.play(pinger, idler)
+        self.assertEqual((1, [False, False]), (result.winner, result.crashed))
+        self.assertEqual(30, result.health[0])
+        self.assertLessEqual(result.health[1], 0)
+        self.assertEqual([30.0, 25.0], pinger.enemy_health[:2], "Every ping should score on an undefended side")
+        self.assertEqual(pinger.enemy_health, idler.health, "Each algo should see the game from its own perspective")
+        self.assertEqual(len(idler.health), result.turns)
+
+        result = engine.play(CrashAlgo(), IdleAlgo())
+        self.assertEqual((2, 0, [True, False]), (result.winner, result.turns, result.crashed))
+
+        class WallAlgo(AlgoCore):
+            def __init__(self):
+                super().__init__()
+                self.walls = []
+                self.stability = []
+
+            def on_turn(self, turn_state):
+                game_state = type(game)(self.config, turn_state)
+                units = [unit for x, y in game_state.game_map for unit in game_state.game_map[x, y]]
+                self.walls.append(len(units))
+                self.stability.append(min([unit.stability for unit in units], default=1))
+                # The pings are trapped behind the front row, and self destruct against it
+                game_state.attempt_spawn("FF", [[x, 13] for x in range(28)])
+                game_state.submit_turn()
+
+        waller = WallAlgo()
+        engine.play(PingAlgo(), waller)
+        self.assertTrue(any(walls < 28 for walls in waller.walls[2:]), "Self destructs should destroy some of the wall")
+        self.assertGreater(min(waller.stability), 0, "Destroyed units should not be carried into the next turn")
+
+    def test_transports(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        lines = [json.dumps(game.config), game.serialized_string,
+                 '{"turnInfo":[2,0,0],"p1Stats":[30,25,5,0],"p2Stats":[30,25,5,0],"p1Units":[],"p2Units":[]}']
+        game_lines = ("\n".join(lines) + "\n").encode()
+
+        class FilterAlgo(AlgoCore):
+            def on_turn(self, turn_state):
+                game_state = type(game)(self.config, turn_state)
+                game_state.attempt_spawn("FF", [13, 4])
+                game_state.submit_turn()
+
+        class CountingWriter(io.BytesIO):
+            writes = 0
+
+            def write(self, data):
+                self.writes += 1
+                return super().write(data)
+
+        turn = [b'[["FF", 13, 4]]', b"[]"]
+        try:
+            algo = FilterAlgo()
+            writer = CountingWriter()
+            algo.transport = StreamTransport(io.BytesIO(game_lines), writer)
+            with contextlib.redirect_stderr(io.StringIO()):
+                algo.start()
+            self.assertEqual(turn, writer.getvalue().splitlines())
+            self.assertEqual(1, writer.writes, "Both lines of the turn should be written at once")
+
+            game_side, algo_side = socket.socketpair()
+            with game_side:
+                game_side.sendall(game_lines)
+                algo = FilterAlgo()
+                algo.transport = SocketTransport(algo_side)
+                with contextlib.redirect_stderr(io.StringIO()):
+                    algo.start()
+                algo.transport.close()
+                self.assertEqual(turn, game_side.makefile("rb").read().splitlines())
+        finally:
+            set_transport(None)
+
+    def test_peek_turn_info(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        self.assertEqual([0, 0, -1], peek_turn_info(game.serialized_string.encode()))
+        units = [[[x, 14, 60.0, str(x)] for x in range(28)]] * 3 + [[]] * 4
+        crowded = json.dumps({"p2Units": units * 20, "turnInfo": [1, 12, 34], "events": {}}).encode()
+        self.assertGreater(crowded.find(b"turnInfo"), 4096)
+        self.assertEqual([1, 12, 34], peek_turn_info(crowded), "turnInfo should be found after a large board")
+        self.assertEqual([2, 3, 0], peek_turn_info(b'{"turnInfo": [2.0, 3.0, 0.0]}'))
+        self.assertIsNone(peek_turn_info(json.dumps(game.config).encode()), "The config has no turnInfo")
@@ -0,0 +1,172 @@
+import queue
+import socket
+import sys
+
+"""
+A transport carries the lines between an algo and the game. AlgoCore.transport picks the one an algo uses,
+and util.set_transport the one get_command and send_command use on the current thread.
+
+Every transport has a read_line() method returning the next line as bytes, including its line break,
+or an empty bytes object once the game is over, a write_line(line) method taking a line without its line break,
+and a flush() method. Written lines may be held until flush, so the two lines of a turn are sent at once.
+"""
+
+
+class StdioTransport:
+    """Talks to the game through stdin and stdout, which is how the game runs algos
+
+    sys.stdin and sys.stdout are looked up on every call, so they can be replaced while the algo runs.
+
+    """
+    def __init__(self):
+        self._pending = []
+
+    def read_line(self):
+        # The binary stream underneath sys.stdin skips decoding, if there is one
+        stream = getattr(sys.stdin, "buffer", None)
+        if stream is not None:
+            return stream.readline()
+        return sys.stdin.readline().encode("utf-8")
+
+    def write_line(self, line):
+        self._pending.append(line + "\n")
+
+    def flush(self):
+        if self._pending:
+            sys.stdout.write("".join(self._pending))
+            self._pending = []
+        sys.stdout.flush()
+
+
+class StreamTransport:
+    """Talks to the game through a pair of binary streams, like the two ends of a pipe
+    """
+    def __init__(self, reader, writer):
+        """Wraps the streams
+
+        Args:
+            * reader: A binary stream the game's lines are read from, for example os.fdopen(read_fd, "rb")
+            * writer: A binary stream the algo's lines are written to
+
+        """
+        self._reader = reader
+        self._writer = writer
+        self._pending = []
+
+    def read_line(self):
+        return self._reader.readline()
+
+    def write_line(self, line):
+        self._pending.append(line.encode("utf-8") + b"\n")
+
+    def flush(self):
+        if self._pending:
+            self._writer.write(b"".join(self._pending))
+            self._pending = []
+        self._writer.flush()
+
+    def close(self):
+        self._reader.close()
+        self._writer.close()
+
+
+class SocketTransport(StreamTransport):
+    """Talks to the game through a connected socket, such as a local Unix socket or a TCP connection to a driver
+
+    Attributes:
+        * connection (socket.socket): The connection to the game
+
+    """
+    def __init__(self, connection):
+        """Wraps the connection
+
+        Args:
+            * connection: A connected socket
+
+        """
+        self.connection = connection
+        super().__init__(connection.makefile("rb"), None)
+
+    @staticmethod
+    def connect(address):
+        """Connects to a game listening on a socket
+
+        Args:
+            * address: A path for a Unix socket, or a (host, port) tuple for TCP
+
+        Returns:
+            A SocketTransport for the connection
+
+        """
+        if isinstance(address, str):
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            # Turns are small and wait for an answer, so they are sent right away
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection.connect(address)
+        return SocketTransport(connection)
+
+    def flush(self):
+        if self._pending:
+            self.connection.sendall(b"".join(self._pending))
+            self._pending = []
+
+    def close(self):
+        self._reader.close()
+        self.connection.close()
+
+
+class QueueTransport:
+    """Passes lines between an algo and a game running in the same process
+
+    The algo reads and writes through it once it is the algo's AlgoCore.transport.
+    The game uses send, receive and close from its own thread.
+
+    """
+    def __init__(self):
+        self._to_algo = queue.Queue()
+        self._from_algo = queue.Queue()
+
+    def read_line(self):
+        return self._to_algo.get()
+
+    def write_line(self, line):
+        self._from_algo.put(line)
+
+    def flush(self):
+        pass
+
+    def disconnect(self):
+        """Called on the algo's thread once the algo stops, so the game stops waiting for it
+        """
+        self._from_algo.put(None)
+
+    def send(self, line):
+        """Sends a line to the algo
+
+        Args:
+            * line: The line as a string, without its line break
+
+        """
+        self._to_algo.put(line.encode("utf-8") + b"\n")
+
+    def receive(self, timeout=None):
+        """Gets the next line the algo sent
+
+        Args:
+            * timeout: The number of seconds to wait for it, forever if None
+
+        Returns:
+            The line, without its line break, or None if the algo stopped or did not send one in time
+
+        """
+        try:
+            return self._from_algo.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """Tells the algo the game is gone, as if stdin was closed
+        """
+        self._to_algo.put(b"")
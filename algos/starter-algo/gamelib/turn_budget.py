@@ -0,0 +1,70 @@
+import time
+
+
+class TurnBudget:
+    """Keeps time for a single turn
+
+    AlgoCore starts one as soon as a turn's state arrives and keeps the finished ones in
+    AlgoCore.turn_timings. All times are time.monotonic() values, in seconds.
+
+    Attributes:
+        * turn_number (int): The turn being timed
+        * started (float): When the turn's state arrived
+        * deadline (float): When the turn should be submitted by
+        * steps (int): The number of plans AlgoCore.submit_anytime got before submitting
+        * forced (bool): Whether the turn was submitted before the strategy finished planning, because time ran out
+        * submitted (float): When submit_anytime submitted the turn, None if it did not
+        * finished (float): When on_turn returned, None until then
+
+    """
+    def __init__(self, turn_number, time_limit, started=None):
+        """Starts the clock
+
+        Args:
+            * turn_number: The turn being timed
+            * time_limit: The number of seconds the turn may take
+            * started: When the turn started, now if not given
+
+        """
+        self.turn_number = turn_number
+        self.started = time.monotonic() if started is None else started
+        self.deadline = self.started + time_limit
+        self.steps = 0
+        self.forced = False
+        self.submitted = None
+        self.finished = None
+
+    def elapsed(self):
+        """Gets the time spent on this turn so far, or in total once it is finished
+
+        Returns:
+            The number of seconds since the turn started
+
+        """
+        end = time.monotonic() if self.finished is None else self.finished
+        return end - self.started
+
+    def remaining(self):
+        """Gets the time left before the deadline
+
+        Returns:
+            The number of seconds until the deadline, negative once it has passed
+
+        """
+        return self.deadline - time.monotonic()
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def finish(self):
+        self.finished = time.monotonic()
+
+    def __toString(self):
+        forced = ", forced" if self.forced else ""
+        return "Turn {}: {:.3f}s, {} steps{}".format(self.turn_number, self.elapsed(), self.steps, forced)
+
+    def __str__(self):
+        return self.__toString()
+
+    def __repr__(self):
+        return self.__toString()
@@ -1,8 +1,63 @@
+import threading
+from collections import namedtuple
+
 def is_stationary(unit_type, firewall_types):
     return unit_type in firewall_types
 
+"""
+The attributes every unit of a given type shares. One record per unit type is built for each config
+and referenced by every GameUnit of that type, so units only store what differs between them.
+"""
+UnitStats = namedtuple("UnitStats", ["config", "stationary", "speed", "damage", "damage_f", "damage_i", "range", "max_stability", "cost"])
+
+# Maps id(config) to the config, which keeps the id from being reused, and the UnitStats of each unit type in it.
+# Only the configs used most recently are kept, enough for a few algos playing in one process
+_type_stats = {}
+_TYPE_STATS_SIZE = 8
+_type_stats_lock = threading.Lock()
+
+def get_type_stats(config):
+    """Gets the UnitStats record of every unit type, built once per config
+
+    Called by AlgoCore when the config arrives, and lazily by GameUnit otherwise.
+
+    Args:
+        * config (JSON): Contains information about the game
+
+    Returns:
+        A dictionary mapping each unit type to its UnitStats
+
+    """
+    cached = _type_stats.get(id(config))
+    if cached is not None and cached[0] is config:
+        return cached[1]
+
+    unit_information = config["unitInformation"]
+    # The first three unit types are the firewalls, and the second of them is the encryptor
+    firewall_types = [type_config["shorthand"] for type_config in unit_information[:3]]
+    encryptor = unit_information[1]["shorthand"]
+    stats = {}
+    for type_config in unit_information:
+        unit_type = type_config["shorthand"]
+        if "stability" not in type_config:
+            # Not a real unit, for example the remove action
+            continue
+        stationary = is_stationary(unit_type, firewall_types)
+        if stationary:
+            damage = type_config["shieldAmount"] if unit_type == encryptor else type_config["damage"]
+            stats[unit_type] = UnitStats(config, True, 0, damage, 0, 0,
+                                         type_config["range"], type_config["stability"], type_config["cost"])
+        else:
+            stats[unit_type] = UnitStats(config, False, type_config["speed"], 0, type_config["damageF"], type_config["damageI"],
+                                         type_config["range"], type_config["stability"], type_config["cost"])
+    with _type_stats_lock:
+        _type_stats[id(config)] = (config, stats)
+        while len(_type_stats) > _TYPE_STATS_SIZE:
+            del _type_stats[next(iter(_type_stats))]
+    return stats
+
 class GameUnit:
-    """Holds information about a Unit. 
+    """Holds information about a Unit.
 
     Attributes:
         * unit_type (string): This unit's type
@@ -20,37 +75,84 @@ class GameUnit:
         * stability (float): The current health of this unit
         * cost (int): The resource cost of this unit
 
+    Attributes that only depend on the unit type are read from a shared UnitStats record.
+    Setting one of them gives the unit a copy of the record, so other units of its type are not changed.
+
     """
+    __slots__ = ("unit_type", "player_index", "pending_removal", "x", "y", "stability", "stationary", "stats")
+
     def __init__(self, unit_type, config, player_index=None, stability=None, x=-1, y=-1):
         """ Initialize unit variables using args passed
 
         """
         self.unit_type = unit_type
-        self.config = config
         self.player_index = player_index
         self.pending_removal = False
         self.x = x
         self.y = y
-        self.__serialize_type()
-        self.stability = self.max_stability if not stability else stability
-
-    def __serialize_type(self):
-        from .game_state import FIREWALL_TYPES, UNIT_TYPE_TO_INDEX, ENCRYPTOR
-        self.stationary = is_stationary(self.unit_type, FIREWALL_TYPES)
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        if self.stationary:
-            self.speed = 0
-            if self.unit_type == ENCRYPTOR:
-                self.damage = type_config["shieldAmount"]
-            else:
-                self.damage = type_config["damage"]
-        else:
-            self.speed = type_config["speed"]
-            self.damage_f = type_config["damageF"]
-            self.damage_i = type_config["damageI"]
-        self.range = type_config["range"]
-        self.max_stability = type_config["stability"]
-        self.cost = type_config["cost"]
+        self.stats = get_type_stats(config)[unit_type]
+        self.stationary = self.stats.stationary
+        self.stability = self.stats.max_stability if not stability else stability
+
+    @property
+    def config(self):
+        return self.stats.config
+
+    @property
+    def speed(self):
+        return self.stats.speed
+
+    @speed.setter
+    def speed(self, value):
+        self.stats = self.stats._replace(speed=value)
+
+    @property
+    def damage(self):
+        return self.stats.damage
+
+    @damage.setter
+    def damage(self, value):
+        self.stats = self.stats._replace(damage=value)
+
+    @property
+    def damage_f(self):
+        return self.stats.damage_f
+
+    @damage_f.setter
+    def damage_f(self, value):
+        self.stats = self.stats._replace(damage_f=value)
+
+    @property
+    def damage_i(self):
+        return self.stats.damage_i
+
+    @damage_i.setter
+    def damage_i(self, value):
+        self.stats = self.stats._replace(damage_i=value)
+
+    @property
+    def range(self):
+        return self.stats.range
+
+    @range.setter
+    def range(self, value):
+        self.stats = self.stats._replace(range=value)
+
+    @property
+    def max_stability(self):
+        return self.stats.max_stability
+
+    @max_stability.setter
+    def max_stability(self, value):
+        self.stats = self.stats._replace(max_stability=value)
+
+    @property
+    def cost(self):
+        return self.stats.cost
+
+    @cost.setter
+    def cost(self, value):
+        self.stats = self.stats._replace(cost=value)
 
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
@@ -62,4 +164,3 @@ class GameUnit:
 
     def __repr__(self):
         return self.__toString()
-
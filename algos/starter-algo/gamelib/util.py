@@ -1,33 +1,90 @@
 import sys
+import json
+import threading
+
+from .transport import StdioTransport
+
+try:
+    import orjson as _json_backend
+except ImportError:
+    try:
+        import ujson as _json_backend
+    except ImportError:
+        _json_backend = json
 
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
 
+# The most recently decoded line and its result, so a line is only decoded once
+_last_decoded = (None, None)
+
+# turnInfo follows the enemy's units in a state, so it is usually found within this many bytes
+_TURN_INFO_KEY = b'"turnInfo"'
+_TURN_INFO_SCAN = 4096
+
+# The transport set for each thread, see set_transport
+_transports = threading.local()
+_stdio = StdioTransport()
+
+
+def set_transport(transport):
+    """Makes get_command and send_command on this thread talk to the game through transport
+    Usually called by AlgoCore.start with AlgoCore.transport
+
+    Args:
+        * transport: One of the transports in gamelib.transport, or None for stdin and stdout
+
+    """
+    _transports.current = transport
+
+def get_transport():
+    """Gets the transport get_command and send_command use on this thread
+
+    Returns:
+        The transport set with set_transport, or the one for stdin and stdout
+
+    """
+    return getattr(_transports, "current", None) or _stdio
 
 def get_command():
     """Gets input from stdin
 
+    """
+    return get_raw_command().decode("utf-8")
+
+def get_raw_command():
+    """Gets input from stdin as bytes, or from the transport set with set_transport
+
+    Returns:
+        The line read, including its line break
+
     """
     try:
-        ret = sys.stdin.readline()
+        ret = get_transport().read_line()
     except EOFError:
         # Game parent process terminated so exit
         debug_write("Got EOF, parent game process must have died, exiting for cleanup")
         exit()
-    if ret == "":
+    if not ret:
         # Happens if parent game process dies, so exit for cleanup, 
         # Don't change or starter-algo process won't exit even though the game has closed
         debug_write("Got EOF, parent game process must have died, exiting for cleanup")
         exit()
     return ret
 
-def send_command(cmd):
+def send_command(cmd, flush=True):
     """Sends your turn to standard output.
     Should usually only be called by 'GameState.submit_turn()'
 
+    Args:
+        * cmd: The line to send
+        * flush: Whether to send it right away. Otherwise it is held and sent with the next line that is flushed
+
     """
-    sys.stdout.write(cmd.strip() + "\n")
-    sys.stdout.flush()
+    transport = get_transport()
+    transport.write_line(cmd.strip())
+    if flush:
+        transport.flush()
 
 def debug_write(*msg):
     """Prints a message to the games debug output
@@ -39,3 +96,49 @@ def debug_write(*msg):
     #Printing to STDERR is okay and printed out by the game but doesn't effect turns.
     sys.stderr.write(", ".join(map(str, msg)).strip() + "\n")
     sys.stderr.flush()
+
+def decode_json(line):
+    """Decodes a json string using the fastest available json library
+
+    orjson or ujson are used when installed, otherwise the standard json module.
+    The last result is remembered, so decoding the same line again is free.
+    The returned object is shared between callers and should not be modified.
+
+    Args:
+        * line: The json string to decode
+
+    Returns:
+        The decoded object
+
+    """
+    global _last_decoded
+    # Read once, precompute may be decoding on another thread
+    last_line, last_decoded = _last_decoded
+    if line == last_line:
+        return last_decoded
+    decoded = _json_backend.loads(line)
+    _last_decoded = (line, decoded)
+    return decoded
+
+def peek_turn_info(line):
+    """Reads the turnInfo of a state without decoding the rest of it
+
+    The start of the line is searched first, and the rest only if turnInfo is not found there.
+    Nothing else is decoded, so this is much faster than decoding the line.
+
+    Args:
+        * line: A line received from the game, as bytes
+
+    Returns:
+        The turnInfo as a list of integers, [state type, turn number, frame number], or None if the line has no turnInfo
+
+    """
+    key = line.find(_TURN_INFO_KEY, 0, _TURN_INFO_SCAN)
+    if key == -1:
+        # Unit ids are numbers, so the first match is always the key
+        key = line.find(_TURN_INFO_KEY)
+        if key == -1:
+            return None
+    start = line.index(b"[", key)
+    end = line.index(b"]", start)
+    return [int(float(value)) for value in line[start + 1:end].split(b",")]
@@ -0,0 +1,124 @@
+"""
+Summarizes a directory of replays into a json file, reading the replays on a pool of processes.
+
+For each game it records the endStats and where each player scored, then adds them up over all games.
+With --incremental, replays already in the summary file are not read again.
+
+    python3 scripts/analyze_replays.py [replay_dir] [--output summary.json] [--processes N] [--incremental]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+# The stats of each player in endStats that are added up over all games
+PLAYER_STATS = ["points_scored", "total_computation_time", "stationary_resource_spent", "dynamic_resource_spent",
+                "dynamic_resource_destroyed", "dynamic_resource_spoiled", "stationary_resource_left_on_board"]
+
+
+def add_algo_path(algo):
+    """
+    Makes the gamelib of an algo importable, in this process and in each worker.
+    """
+    sys.path.insert(0, os.path.abspath(algo))
+
+
+def analyze_replay(path):
+    """
+    Reads one replay. Returns its file name, its size and modification time, to tell if it changed, and its summary.
+    """
+    from gamelib.replay import ReplayReader
+
+    status = os.stat(path)
+    breaches = {}
+    with ReplayReader(path) as reader:
+        for frame in reader.frames(state_type=1):
+            for location, damage, unit_type, unit_id, player in frame.get_events("breach"):
+                key = (location[0], location[1], player - 1)
+                breaches[key] = breaches.get(key, 0) + 1
+        end_stats = reader.end_stats()
+
+    game = {"size": status.st_size, "mtime": status.st_mtime, "complete": end_stats is not None,
+            "breaches": [[x, y, player_index, count] for (x, y, player_index), count in sorted(breaches.items())]}
+    if end_stats is not None:
+        game.update({key: end_stats.get(key) for key in ["winner", "turns", "frames", "duration"]})
+        for player_index, name in enumerate(["player1", "player2"]):
+            stats = end_stats.get(name, {})
+            game["p{}".format(player_index + 1)] = dict({key: stats.get(key, 0) for key in PLAYER_STATS},
+                                                        crashed=stats.get("crashed", False), name=stats.get("name"))
+    return os.path.basename(path), game
+
+
+def aggregate(games):
+    """
+    Adds up the summaries of all games.
+    """
+    complete = [game for game in games.values() if game["complete"]]
+    wins = [0, 0]
+    totals = [{key: 0 for key in PLAYER_STATS}, {key: 0 for key in PLAYER_STATS}]
+    for game in complete:
+        if game["winner"] in (1, 2):
+            wins[game["winner"] - 1] += 1
+        for player_index in range(2):
+            for key in PLAYER_STATS:
+                totals[player_index][key] += game["p{}".format(player_index + 1)][key]
+
+    breaches = {}
+    for game in games.values():
+        for x, y, player_index, count in game["breaches"]:
+            breaches[x, y, player_index] = breaches.get((x, y, player_index), 0) + count
+
+    count = max(1, len(complete))
+    return {
+        "games": len(games),
+        "complete": len(complete),
+        "wins": wins,
+        "turns": sum(game["turns"] for game in complete) / count,
+        "p1": {key: value / count for key, value in totals[0].items()},
+        "p2": {key: value / count for key, value in totals[1].items()},
+        "breaches": [[x, y, player_index, total] for (x, y, player_index), total in sorted(breaches.items())],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a directory of replays")
+    parser.add_argument("replay_dir", nargs="?", default="replays", help="directory of .replay files")
+    parser.add_argument("--output", help="summary file to write, replay_dir/summary.json by default")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes, one per core by default")
+    parser.add_argument("--incremental", action="store_true", help="only read replays that are new or changed since the last summary")
+    parser.add_argument("--algo", default=os.path.join("algos", "starter-algo"), help="algo directory to load gamelib from")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(args.replay_dir, "summary.json")
+    paths = sorted(os.path.join(args.replay_dir, name) for name in os.listdir(args.replay_dir) if name.endswith(".replay"))
+
+    games = {}
+    if args.incremental and os.path.exists(output):
+        with open(output) as summary:
+            games = json.load(summary)["games"]
+    names = set(os.path.basename(path) for path in paths)
+    games = {name: game for name, game in games.items() if name in names}
+
+    def unchanged(path):
+        game = games.get(os.path.basename(path))
+        if game is None:
+            return False
+        status = os.stat(path)
+        return game["size"] == status.st_size and game["mtime"] == status.st_mtime
+
+    todo = [path for path in paths if not unchanged(path)]
+    print("Analyzing {} of {} replays".format(len(todo), len(paths)))
+    if todo:
+        with multiprocessing.Pool(args.processes, add_algo_path, (args.algo,)) as pool:
+            # Replays are large, so they are handed out one at a time to keep every process busy
+            for name, game in pool.imap_unordered(analyze_replay, todo):
+                games[name] = game
+
+    with open(output, "w") as summary:
+        json.dump({"aggregate": aggregate(games), "games": dict(sorted(games.items()))}, summary, separators=(",", ":"))
+    print("Done: saved in {}".format(output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+#!/usr/bin/env bash
+echo "Analyze Replays"
+defaultReplays=$PWD/replays
+
+replayDir=${1:-${defaultReplays}}
+replayDir=${replayDir%/}
+shift
+
+DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+${PYTHON_CMD:-python3} "$DIR/analyze_replays.py" "${replayDir}" "$@"
@@ -0,0 +1,126 @@
+"""
+Replays the turns recorded in a directory of replays through an algo, and compares what it builds and deploys
+with a baseline saved from an earlier run. No engine is needed, and turns are played on a pool of processes.
+
+Each turn is played by a new AlgoStrategy, given the replay's config and the state at the start of the turn through
+stdin as the engine would, with random seeded from the replay and turn so that runs can be compared.
+The states are from player 1's perspective, like the replays.
+
+    python3 scripts/regress_algo.py algo_dir [replay_dir] [--baseline file] [--update] [--processes N]
+
+The first run, or a run with --update, saves the baseline. Later runs print the turns that changed and exit with 1 if any did.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import sys
+import zlib
+
+END_STATE = '{"turnInfo":[2,0,0],"p1Stats":[30,25,5,0],"p2Stats":[30,25,5,0],"p1Units":[],"p2Units":[]}'
+
+# Set up in each worker process by init_worker
+_algo_module = None
+
+
+def read_turns(replay_dir, reader_algo):
+    """
+    Gets the config and the state at the start of every turn of every replay, as (key, config line, state line) tuples.
+    """
+    sys.path.insert(0, os.path.abspath(reader_algo))
+    from gamelib.replay import ReplayReader
+
+    turns = []
+    for name in sorted(os.listdir(replay_dir)):
+        if not name.endswith(".replay"):
+            continue
+        with ReplayReader(os.path.join(replay_dir, name)) as reader:
+            if reader.config is None:
+                continue
+            config = json.dumps(reader.config)
+            # The state lines are passed on as they are, without being decoded
+            for frame in reader.frames(state_type=0):
+                turns.append(("{}:{}".format(name, frame.turn_number), config, frame.line))
+    return turns
+
+
+def init_worker(algo):
+    """
+    Imports the algo, with the gamelib it comes with. Workers are started fresh, so each algo gets its own gamelib.
+    """
+    global _algo_module
+    algo = os.path.abspath(algo)
+    sys.path.insert(0, algo)
+    os.chdir(algo)
+    import algo_strategy
+    _algo_module = algo_strategy
+
+
+def play_turn(turn):
+    """
+    Plays one turn, returning its key and the build and deploy lines the algo printed.
+    """
+    key, config, state = turn
+    algo = _algo_module.AlgoStrategy()
+    random.seed(zlib.crc32(key.encode("utf-8")))
+    stdin = sys.stdin
+    sys.stdin = io.StringIO("\n".join([config, state, END_STATE]) + "\n")
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+            algo.start()
+    finally:
+        sys.stdin = stdin
+    return key, output.getvalue().splitlines()
+
+
+def compare(baseline, results):
+    """
+    Gets the keys of the turns played differently from the baseline, and of the ones the baseline does not have.
+    """
+    changed = sorted(key for key, lines in results.items() if key in baseline and baseline[key] != lines)
+    added = sorted(key for key in results if key not in baseline)
+    return changed, added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare an algo's turns on recorded replays with a baseline")
+    parser.add_argument("algo", help="directory of the algo to test")
+    parser.add_argument("replay_dir", nargs="?", default="replays", help="directory of .replay files")
+    parser.add_argument("--baseline", help="baseline file, replay_dir/<algo name>.baseline.json by default")
+    parser.add_argument("--update", action="store_true", help="save this run as the baseline")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes, one per core by default")
+    parser.add_argument("--reader-algo", default=os.path.join("algos", "starter-algo"), help="algo directory to load the replay reader from")
+    args = parser.parse_args()
+
+    algo = args.algo.rstrip("/\\")
+    baseline_path = args.baseline or os.path.join(args.replay_dir, "{}.baseline.json".format(os.path.basename(algo)))
+    turns = read_turns(args.replay_dir, args.reader_algo)
+    print("Playing {} turns with {}".format(len(turns), algo))
+
+    # Fresh worker processes, since this process has already imported a gamelib to read the replays
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(args.processes, init_worker, (algo,)) as pool:
+        results = dict(pool.imap_unordered(play_turn, turns, chunksize=16))
+
+    if args.update or not os.path.exists(baseline_path):
+        with open(baseline_path, "w") as baseline_file:
+            json.dump(dict(sorted(results.items())), baseline_file, indent=0)
+        print("Done: saved baseline in {}".format(baseline_path))
+        return
+
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    changed, added = compare(baseline, results)
+    for key in changed:
+        print("{}\n  baseline: {}\n  now:      {}".format(key, " ".join(baseline[key]), " ".join(results[key])))
+    print("{} of {} turns changed, {} not in the baseline".format(len(changed), len(results), len(added)))
+    if changed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+#!/usr/bin/env bash
+echo "Regress Algo"
+defaultAlgo=$PWD/algos/starter-algo
+defaultReplays=$PWD/replays
+
+algo=${1:-${defaultAlgo}}
+algo=${algo%/}
+replayDir=${2:-${defaultReplays}}
+replayDir=${replayDir%/}
+shift $(( $# < 2 ? $# : 2 ))
+
+DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
+${PYTHON_CMD:-python3} "$DIR/regress_algo.py" "${algo}" "${replayDir}" "$@"